@@ -0,0 +1,90 @@
+from django.db import transaction
+from django.utils import timezone
+
+from users.models import User
+
+from .models import Role, RoleAssignment, RoleChangeRequest
+from .roles import bump_role_versions
+
+
+def assign_roles(pairs):
+    """Assign ``[(user_id, role_id), ...]`` with set-based checks and one bulk insert.
+
+    Returns one result dict per pair, in input order. bulk_create skips the
+    RoleAssignment signals, so the affected users' role versions are bumped here.
+    """
+    user_ids = {user_id for user_id, _ in pairs}
+    role_ids = {role_id for _, role_id in pairs}
+    known_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    known_roles = set(Role.objects.filter(pk__in=role_ids).values_list('pk', flat=True))
+    existing = set(
+        RoleAssignment.objects.filter(user_id__in=known_users, role_id__in=known_roles).values_list('user_id', 'role_id')
+    )
+
+    results = []
+    pending = {}
+    for user_id, role_id in pairs:
+        result = {'user': user_id, 'role': role_id}
+        if user_id not in known_users:
+            result.update(status='invalid', detail='unknown user')
+        elif role_id not in known_roles:
+            result.update(status='invalid', detail='unknown role')
+        elif (user_id, role_id) in existing:
+            result['status'] = 'exists'
+        elif (user_id, role_id) in pending:
+            result['status'] = 'duplicate'
+        else:
+            pending[(user_id, role_id)] = result
+        results.append(result)
+
+    with transaction.atomic():
+        created = RoleAssignment.objects.bulk_create(
+            RoleAssignment(user_id=user_id, role_id=role_id) for user_id, role_id in pending
+        )
+        transaction.on_commit(lambda: bump_role_versions({user_id for user_id, _ in pending}))
+    for assignment in created:
+        pending[(assignment.user_id, assignment.role_id)].update(status='assigned', id=assignment.pk)
+    return results
+
+
+def decide_role_changes(request_ids, action, processed_by):
+    """Approve or reject the RoleChangeRequests ``request_ids`` in one transaction.
+
+    Approval assigns the requested role unless the user already holds it.
+    Returns one result dict per id, in input order.
+    """
+    approve = action == 'approve'
+    now = timezone.now()
+    with transaction.atomic():
+        requests = {
+            r.pk: r for r in RoleChangeRequest.objects.select_for_update().filter(pk__in=set(request_ids))
+        }
+        to_update = {}
+        results = []
+        for request_id in request_ids:
+            r = requests.get(request_id)
+            if r is None:
+                results.append({'id': request_id, 'status': 'not_found'})
+            elif request_id in to_update or r.status != RoleChangeRequest.REQUESTED:
+                results.append({'id': request_id, 'status': 'already_processed'})
+            else:
+                r.status = RoleChangeRequest.APPROVED if approve else RoleChangeRequest.REJECTED
+                r.processed_at = now
+                r.processed_by = processed_by
+                to_update[request_id] = r
+                results.append({'id': request_id, 'status': r.status})
+
+        RoleChangeRequest.objects.bulk_update(to_update.values(), ['status', 'processed_at', 'processed_by'])
+        if approve:
+            wanted = {(r.user_id, r.requested_role_id) for r in to_update.values()}
+            held = set(
+                RoleAssignment.objects.filter(
+                    user_id__in={u for u, _ in wanted}, role_id__in={role for _, role in wanted},
+                ).values_list('user_id', 'role_id')
+            )
+            new_pairs = wanted - held
+            RoleAssignment.objects.bulk_create(
+                RoleAssignment(user_id=user_id, role_id=role_id) for user_id, role_id in new_pairs
+            )
+            transaction.on_commit(lambda: bump_role_versions({user_id for user_id, _ in new_pairs}))
+    return results
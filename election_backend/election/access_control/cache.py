@@ -0,0 +1,61 @@
+"""Shared authorization state on the Django cache alias ``settings.AUTHZ_CACHE``.
+
+Version stamps live here so every worker on every node sees a bump at once;
+per-process structures (compiled policies, permission and label matrices)
+compare against them, and `cached_decision` folds them into its keys.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+DECISION_PREFIX = 'access_control:decision:'
+
+
+def authz_cache():
+    return caches[settings.AUTHZ_CACHE]
+
+
+def get_versions(keys):
+    """Return ``{key: version}``, seeding missing counters from the clock.
+
+    Seeding from the clock (rather than 0) means a counter lost to eviction
+    or a flush never comes back with a value anyone has already seen.
+    """
+    cache = authz_cache()
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return versions
+
+
+def get_version(key):
+    return get_versions([key])[key]
+
+
+def bump_versions(keys):
+    """Give every key in ``keys`` a new version with one cache write."""
+    version = time.time_ns()
+    authz_cache().set_many({key: version for key in keys}, None)
+
+
+def bump_version(key):
+    bump_versions([key])
+
+
+def cached_decision(parts, compute, timeout=None):
+    """Return ``compute()``, shared across processes under a key built from ``parts``.
+
+    ``parts`` must include every version the decision depends on, so a bump
+    makes old entries unreachable instead of having to delete them.
+    """
+    cache = authz_cache()
+    key = DECISION_PREFIX + hashlib.sha1(repr(tuple(parts)).encode()).hexdigest()
+    value = cache.get(key)
+    if value is None:
+        value = compute()
+        cache.set(key, value, settings.AUTHZ_CACHE_TIMEOUT if timeout is None else timeout)
+    return value
@@ -0,0 +1,45 @@
+from django.db import transaction
+
+from .models import Role, RoleClosure, RoleImplication
+
+
+def _edges():
+    children = {}
+    for parent_id, child_id in RoleImplication.objects.values_list('parent_id', 'child_id'):
+        children.setdefault(parent_id, []).append(child_id)
+    return children
+
+
+def implied_role_ids(role_id, children=None):
+    """Return ``{role_id: depth}`` for every role reachable from ``role_id``, itself at depth 0."""
+    if children is None:
+        children = _edges()
+    depths = {role_id: 0}
+    frontier = [role_id]
+    while frontier:
+        next_frontier = []
+        for node in frontier:
+            for child in children.get(node, ()):
+                if child not in depths:
+                    depths[child] = depths[node] + 1
+                    next_frontier.append(child)
+        frontier = next_frontier
+    return depths
+
+
+def creates_cycle(parent_id, child_id):
+    """True if adding parent -> child would make a role imply itself."""
+    return parent_id == child_id or parent_id in implied_role_ids(child_id)
+
+
+def rebuild_role_closure():
+    """Recompute RoleClosure from RoleImplication; the hierarchy is small, so rebuild it whole."""
+    children = _edges()
+    rows = [
+        RoleClosure(ancestor_id=role_id, descendant_id=descendant_id, depth=depth)
+        for role_id in Role.objects.values_list('id', flat=True)
+        for descendant_id, depth in implied_role_ids(role_id, children).items()
+    ]
+    with transaction.atomic():
+        RoleClosure.objects.all().delete()
+        RoleClosure.objects.bulk_create(rows)
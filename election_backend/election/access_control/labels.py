@@ -0,0 +1,74 @@
+"""Mandatory access control over `SecurityLabel` levels.
+
+Labels are totally ordered by ``level`` (higher dominates lower, equal levels
+dominate each other). Names compare case-insensitively; an empty label marks
+an unclassified row that everyone may see, and an unknown label dominates,
+and is dominated by, nothing else.
+"""
+import threading
+
+from .cache import bump_version, get_version
+from .models import SecurityLabel
+
+VERSION_KEY = 'access_control:labels:version'
+
+UNLABELED = ''
+
+_lock = threading.Lock()
+# (version, {label: frozenset of labels it dominates}) for this process
+_state = (None, {})
+
+
+def _build_matrix():
+    levels = {}
+    spellings = {}
+    for name, level in SecurityLabel.objects.values_list('name', 'level'):
+        # duplicate names keep their highest level
+        key = name.lower()
+        levels[key] = max(level, levels.get(key, level))
+        spellings.setdefault(key, {key}).add(name)
+    # each set holds lower-cased names for dominates() and stored spellings for queryset filters
+    return {
+        label: frozenset([UNLABELED]).union(*(spellings[other] for other, other_level in levels.items() if other_level <= level))
+        for label, level in levels.items()
+    }
+
+
+def _matrix():
+    global _state
+    version = get_version(VERSION_KEY)
+    cached_version, matrix = _state
+    if cached_version != version:
+        with _lock:
+            matrix = _build_matrix()
+            _state = (version, matrix)
+    return matrix
+
+
+def invalidate_labels():
+    """Rebuild the dominance matrix in every process; call after writing `SecurityLabel` rows."""
+    global _state
+    bump_version(VERSION_KEY)
+    _state = (None, {})
+
+
+def dominated_labels(user_label):
+    """Return the labels ``user_label`` may read, including the empty label."""
+    return _matrix().get((user_label or '').lower(), frozenset([UNLABELED]))
+
+
+def dominates(user_label, resource_label):
+    """True if a subject cleared for ``user_label`` may read data labelled ``resource_label``."""
+    return (resource_label or '').lower() in dominated_labels(user_label)
+
+
+def filter_by_clearance(queryset, user, field='security_label'):
+    """Restrict ``queryset`` to rows whose ``field`` label ``user``'s clearance dominates.
+
+    A no-op while no SecurityLabel rows exist, so deployments without MAC see
+    every row.
+    """
+    matrix = _matrix()
+    if not matrix:
+        return queryset
+    return queryset.filter(**{'%s__in' % field: dominated_labels(user.clearance_label)})
@@ -0,0 +1,98 @@
+import threading
+
+from .cache import bump_version, get_version
+from .models import Permission, RolePermission
+from .roles import user_roles
+
+VERSION_KEY = 'access_control:permissions:version'
+
+# attribute on the underlying HttpRequest holding the memoized (matrix, permission bitset)
+_BITS_ATTR = '_access_control_permission_bits'
+
+_lock = threading.Lock()
+
+
+class _Matrix:
+    """Role -> permission bitset matrix.
+
+    Permission ids are mapped to dense indices when the matrix is built, so
+    bitsets stay as wide as the number of permissions however sparse or large
+    the ids get. Bit ``n`` stands for ``names[n]``; the indices are only
+    meaningful for the matrix that produced them.
+    """
+
+    def __init__(self):
+        self.role_bits = {}
+        self.name_bits = {}
+        self.names = []
+        index = {}
+        for perm_id, name in Permission.objects.order_by('id').values_list('id', 'name'):
+            index[perm_id] = len(self.names)
+            # Permission.name is not unique: a name tests any of its ids
+            self.name_bits[name] = self.name_bits.get(name, 0) | (1 << index[perm_id])
+            self.names.append(name)
+        for role_name, perm_id in RolePermission.objects.values_list('role__name', 'permission_id'):
+            role = role_name.lower()
+            self.role_bits[role] = self.role_bits.get(role, 0) | (1 << index[perm_id])
+        # OR of role bitsets, keyed by the frozenset of role names
+        self.combined = {}
+
+    def bits_for(self, roles):
+        bits = self.combined.get(roles)
+        if bits is None:
+            bits = 0
+            for role in roles:
+                bits |= self.role_bits.get(role, 0)
+            self.combined[roles] = bits
+        return bits
+
+
+# (version, _Matrix) for this process
+_state = (None, None)
+
+
+def _matrix():
+    global _state
+    version = get_version(VERSION_KEY)
+    cached_version, matrix = _state
+    if cached_version != version:
+        with _lock:
+            matrix = _Matrix()
+            _state = (version, matrix)
+    return matrix
+
+
+def invalidate_permissions():
+    """Rebuild the matrix in every process; call after writing roles, permissions or their links."""
+    global _state
+    bump_version(VERSION_KEY)
+    _state = (None, None)
+
+
+def _request_matrix(request):
+    # (matrix, bits) memoized together: bits are only meaningful against the matrix they came from,
+    # so a rebuild mid-request must not pair old bits with new indices
+    http_request = getattr(request, '_request', request)
+    memo = getattr(http_request, _BITS_ATTR, None)
+    if memo is None:
+        matrix = _matrix()
+        memo = (matrix, matrix.bits_for(user_roles(request)))
+        setattr(http_request, _BITS_ATTR, memo)
+    return memo
+
+
+def permission_bits(request):
+    """Return the effective permission bitset of ``request.user``, memoized on the request."""
+    return _request_matrix(request)[1]
+
+
+def has_permission(request, name):
+    """True if any role of ``request.user`` grants the permission called ``name``."""
+    matrix, bits = _request_matrix(request)
+    return bool(bits & matrix.name_bits.get(name, 0))
+
+
+def effective_permissions(request):
+    """Return the sorted permission names granted to ``request.user``."""
+    matrix, bits = _request_matrix(request)
+    return sorted({name for i, name in enumerate(matrix.names) if bits >> i & 1})
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access_control', '0002_role_hierarchy'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='securitylabel',
+            name='level',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -21,6 +21,34 @@ class AccessPolicy(models.Model):
 class SecurityLabel(models.Model):
     name = models.CharField(max_length=50)  # Confidential, Internal, Public
     description = models.TextField()
+    # MAC order: a clearance dominates every label whose level is <= its own
+    level = models.PositiveIntegerField(default=0)
+
+
+class RoleImplication(models.Model):
+    """``parent`` implies ``child``: holders of parent also hold child (e.g. Admin -> Officer)."""
+    parent = models.ForeignKey(Role, related_name='implies', on_delete=models.CASCADE)
+    child = models.ForeignKey(Role, related_name='implied_by', on_delete=models.CASCADE)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['parent', 'child'], name='unique_role_implication'),
+        ]
+
+
+class RoleClosure(models.Model):
+    """Transitive closure of RoleImplication, including a depth-0 row per role.
+
+    Rebuilt by `access_control.hierarchy.rebuild_role_closure`; do not edit by hand.
+    """
+    ancestor = models.ForeignKey(Role, related_name='descendant_links', on_delete=models.CASCADE)
+    descendant = models.ForeignKey(Role, related_name='ancestor_links', on_delete=models.CASCADE)
+    depth = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='unique_role_closure'),
+        ]
 
 
 class RoleAssignment(models.Model):
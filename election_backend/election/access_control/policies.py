@@ -0,0 +1,180 @@
+"""ABAC evaluation of `AccessPolicy.rules`.
+
+A policy's ``rules`` is a JSON object such as::
+
+    {"resource": "elections", "action": "vote", "effect": "deny",
+     "role": ["voter"], "district": ["North"], "time": {"start": "08:00", "end": "18:00"}}
+
+``resource`` and ``action`` may be a string, a list or ``"*"``; ``effect`` is
+``allow`` (default) or ``deny``. The remaining keys are conditions, all of which
+must hold for the policy to match: ``role`` (the user holds any of them),
+``district`` (the resource's district is one of them) and ``time`` (local
+time of day, a window that may wrap past midnight).
+
+Decisions are deny-overrides: a matching deny policy refuses; otherwise the
+request is allowed if a matching allow policy exists, or if no allow policy
+covers the resource/action at all.
+"""
+import threading
+from datetime import time as dt_time
+
+from django.utils import timezone
+
+from .cache import bump_version, get_version
+from .models import AccessPolicy
+from .roles import user_roles
+
+VERSION_KEY = 'access_control:policies:version'
+
+ALLOW = 'allow'
+DENY = 'deny'
+WILDCARD = '*'
+
+_lock = threading.Lock()
+# (version, {(resource, action, district): ([allow predicates], [deny predicates])}, merged lookups) for this process
+_state = (None, {}, {})
+
+
+class PolicyError(ValueError):
+    """Raised for rules that cannot be compiled."""
+
+
+def _names(value, key):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(v, str) and v for v in value):
+        raise PolicyError('%s must be a non-empty string or list of strings' % key)
+    return value
+
+
+def _clock(value, key):
+    try:
+        return dt_time.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise PolicyError('time.%s must be HH:MM' % key)
+
+
+def _role_check(value):
+    required = frozenset(name.lower() for name in _names(value, 'role'))
+    return lambda ctx: not required.isdisjoint(ctx.roles)
+
+
+def _time_check(value):
+    if not isinstance(value, dict) or set(value) - {'start', 'end'}:
+        raise PolicyError('time must be an object with start and/or end')
+    start = _clock(value['start'], 'start') if 'start' in value else dt_time.min
+    end = _clock(value['end'], 'end') if 'end' in value else dt_time.max
+    if start <= end:
+        return lambda ctx: start <= ctx.time_of_day < end
+    # overnight window, e.g. 22:00-06:00
+    return lambda ctx: ctx.time_of_day >= start or ctx.time_of_day < end
+
+
+# district is not a predicate: it is part of the index key, see compile_rules
+_CONDITIONS = {
+    'role': _role_check,
+    'time': _time_check,
+}
+
+
+def compile_rules(rules):
+    """Compile one policy's rules into ``(keys, effect, predicate)``.
+
+    ``keys`` lists the (resource, action, district) triples the policy applies
+    to, district None meaning any; the predicate checks the other conditions.
+    """
+    if not isinstance(rules, dict):
+        raise PolicyError('rules must be an object')
+    unknown = set(rules) - {'resource', 'action', 'effect', 'district'} - set(_CONDITIONS)
+    if unknown:
+        raise PolicyError('unknown rule keys: %s' % ', '.join(sorted(unknown)))
+    effect = rules.get('effect', ALLOW)
+    if effect not in (ALLOW, DENY):
+        raise PolicyError('effect must be allow or deny')
+    resources = _names(rules.get('resource', WILDCARD), 'resource')
+    actions = _names(rules.get('action', WILDCARD), 'action')
+    districts = _names(rules['district'], 'district') if 'district' in rules else [None]
+    checks = tuple(build(rules[key]) for key, build in _CONDITIONS.items() if key in rules)
+
+    def predicate(ctx):
+        for check in checks:
+            if not check(ctx):
+                return False
+        return True
+
+    return [(r, a, d) for r in resources for a in actions for d in districts], effect, predicate
+
+
+def _build_index():
+    index = {}
+    for rules in AccessPolicy.objects.values_list('rules', flat=True):
+        try:
+            keys, effect, predicate = compile_rules(rules)
+        except PolicyError:
+            # rows written before validation existed; PoliciesView rejects these now
+            continue
+        for key in keys:
+            allow, deny = index.setdefault(key, ([], []))
+            (deny if effect == DENY else allow).append(predicate)
+    return index
+
+
+def _policies_for(resource, action, district):
+    """Return ``(guarded, allow, deny)`` for the request, wildcards merged in.
+
+    ``guarded`` is True when some allow policy exists for the resource/action.
+    """
+    global _state
+    version = get_version(VERSION_KEY)
+    cached_version, index, merged = _state
+    if cached_version != version:
+        with _lock:
+            index, merged = _build_index(), {}
+            _state = (version, index, merged)
+    found = merged.get((resource, action, district))
+    if found is None:
+        allow, deny = [], []
+        pairs = {(r, a) for r in (resource, WILDCARD) for a in (action, WILDCARD)}
+        # allow policies for any district make the resource/action default-deny
+        guarded = any(allows for (r, a, _), (allows, _) in index.items() if (r, a) in pairs)
+        for r in (resource, WILDCARD):
+            for a in (action, WILDCARD):
+                for d in {district, None}:
+                    if (r, a, d) in index:
+                        allow.extend(index[(r, a, d)][0])
+                        deny.extend(index[(r, a, d)][1])
+        found = merged[(resource, action, district)] = (guarded, tuple(allow), tuple(deny))
+    return found
+
+
+def invalidate_policies():
+    """Drop compiled policies in every process; call after writing `AccessPolicy` rows."""
+    global _state
+    bump_version(VERSION_KEY)
+    _state = (None, {}, {})
+
+
+class _Context:
+    __slots__ = ('roles', 'time_of_day')
+
+    def __init__(self, roles, time_of_day):
+        self.roles = roles
+        self.time_of_day = time_of_day
+
+
+def is_allowed(request, resource, action, district=None, now=None):
+    """Decide whether ``request.user`` may perform ``action`` on ``resource``."""
+    guarded, allow, deny = _policies_for(resource, action, district)
+    if not guarded and not deny:
+        return True
+    now = timezone.localtime(now or timezone.now())
+    ctx = _Context(user_roles(request), now.time())
+    for predicate in deny:
+        if predicate(ctx):
+            return False
+    if not guarded:
+        return True
+    for predicate in allow:
+        if predicate(ctx):
+            return True
+    return False
@@ -0,0 +1,83 @@
+from .cache import bump_version, bump_versions, cached_decision, get_versions
+from .models import Role
+
+# attribute on the underlying HttpRequest holding the memoized role set
+_ROLES_ATTR = '_access_control_roles'
+
+# bumped when a Role is renamed or deleted (affects every holder)
+GLOBAL_VERSION_KEY = 'access_control:roles:version'
+# bumped when one user's RoleAssignment rows change
+USER_VERSION_KEY = 'access_control:roles:version:%s'
+
+# JWT claims carrying the role names and the role version they were read at
+ROLES_CLAIM = 'roles'
+VERSION_CLAIM = 'rv'
+
+
+def role_version(user_id):
+    """Return the current role version of ``user_id`` as a string."""
+    keys = [GLOBAL_VERSION_KEY, USER_VERSION_KEY % user_id]
+    versions = get_versions(keys)
+    return '%s.%s' % (versions[keys[0]], versions[keys[1]])
+
+
+def bump_role_version(user_id=None):
+    """Invalidate role claims of ``user_id``, or of every user when None."""
+    bump_version(GLOBAL_VERSION_KEY if user_id is None else USER_VERSION_KEY % user_id)
+
+
+def bump_role_versions(user_ids):
+    """Invalidate role claims of every user in ``user_ids`` with one cache write."""
+    bump_versions([USER_VERSION_KEY % user_id for user_id in user_ids])
+
+
+def load_roles(user):
+    """Read the lower-cased names of the roles ``user`` holds or implies, in one query."""
+    names = Role.objects.filter(ancestor_links__ancestor__roleassignment__user=user).values_list('name', flat=True).distinct()
+    return frozenset(name.lower() for name in names)
+
+
+def _claimed_roles(request, version):
+    """Roles from the request's access token, or None if absent or stale."""
+    token = getattr(request, 'auth', None)
+    if token is None or not hasattr(token, 'get'):
+        return None
+    roles = token.get(ROLES_CLAIM)
+    if roles is None or token.get(VERSION_CLAIM) != version:
+        return None
+    return frozenset(roles)
+
+
+def user_roles(request):
+    """Return the lower-cased role names of ``request.user``.
+
+    Taken from the access token's role claims when their version is current,
+    otherwise from the shared decision cache or a single query. Either way the
+    result is memoized on the request, so any number of role checks cost at
+    most one lookup.
+    """
+    http_request = getattr(request, '_request', request)
+    roles = getattr(http_request, _ROLES_ATTR, None)
+    if roles is None:
+        user = request.user
+        if user.is_authenticated:
+            version = role_version(user.pk)
+            roles = _claimed_roles(request, version)
+            if roles is None:
+                roles = cached_decision(('roles', user.pk, version), lambda: load_roles(user))
+        else:
+            roles = frozenset()
+        setattr(http_request, _ROLES_ATTR, roles)
+    return roles
+
+
+def has_role(request, *role_names):
+    """True if the requesting user holds or implies any of ``role_names`` (case-insensitive)."""
+    roles = user_roles(request)
+    return any(name.lower() in roles for name in role_names)
+
+
+def is_admin(request):
+    """True for staff, superusers and holders of the Admin role."""
+    user = request.user
+    return user.is_authenticated and (user.is_staff or user.is_superuser or has_role(request, 'Admin'))
@@ -1,5 +1,8 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Role, Permission, RoleAssignment, RoleChangeRequest, AccessPolicy, SecurityLabel
+from .models import Role, Permission, RoleAssignment, RoleChangeRequest, AccessPolicy, SecurityLabel, RoleImplication
+from .hierarchy import creates_cycle
+from .policies import PolicyError, compile_rules
 from users.serializers import UserSerializer
 from users.models import User
 
@@ -16,6 +19,17 @@ class PermissionSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'description')
 
 
+class RoleImplicationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RoleImplication
+        fields = ('id', 'parent', 'child')
+
+    def validate(self, attrs):
+        if creates_cycle(attrs['parent'].id, attrs['child'].id):
+            raise serializers.ValidationError('implication would make a role imply itself')
+        return attrs
+
+
 class RoleAssignmentSerializer(serializers.ModelSerializer):
     user = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
 
@@ -24,6 +38,15 @@ class RoleAssignmentSerializer(serializers.ModelSerializer):
         fields = ('id', 'role', 'user', 'assigned_at')
 
 
+class BulkRoleAssignmentItemSerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    role = serializers.IntegerField()
+
+
+class BulkRoleAssignmentSerializer(serializers.Serializer):
+    assignments = BulkRoleAssignmentItemSerializer(many=True, allow_empty=False, max_length=settings.ACCESS_BULK_MAX_ITEMS)
+
+
 class RoleChangeRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = RoleChangeRequest
@@ -31,13 +54,25 @@ class RoleChangeRequestSerializer(serializers.ModelSerializer):
         read_only_fields = ('status', 'created_at', 'processed_at', 'processed_by')
 
 
+class BulkRoleChangeDecisionSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=settings.ACCESS_BULK_MAX_ITEMS)
+    action = serializers.ChoiceField(choices=('approve', 'reject'))
+
+
 class AccessPolicySerializer(serializers.ModelSerializer):
     class Meta:
         model = AccessPolicy
         fields = ('id', 'name', 'description', 'rules')
 
+    def validate_rules(self, value):
+        try:
+            compile_rules(value)
+        except PolicyError as exc:
+            raise serializers.ValidationError(str(exc))
+        return value
+
 
 class SecurityLabelSerializer(serializers.ModelSerializer):
     class Meta:
         model = SecurityLabel
-        fields = ('id', 'name', 'description')
+        fields = ('id', 'name', 'description', 'level')
@@ -0,0 +1,69 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .hierarchy import rebuild_role_closure
+from .labels import invalidate_labels
+from .matrix import invalidate_permissions
+from .models import AccessPolicy, Permission, Role, RoleAssignment, RoleClosure, RoleImplication, RolePermission, SecurityLabel
+from .policies import invalidate_policies
+from .roles import bump_role_version
+
+
+@receiver(post_save, sender=RoleAssignment)
+@receiver(post_delete, sender=RoleAssignment)
+def assignment_changed(sender, instance, **kwargs):
+    # every bump waits for the commit: bumped earlier, another worker could read the old
+    # rows and cache them under the new version until AUTHZ_CACHE_TIMEOUT
+    transaction.on_commit(partial(bump_role_version, instance.user_id))
+
+
+def _role_renamed_or_deleted():
+    bump_role_version()
+    invalidate_permissions()
+
+
+@receiver(post_save, sender=Role)
+@receiver(post_delete, sender=Role)
+def role_changed(sender, instance, created=False, **kwargs):
+    # a new role has no holders or permissions yet; renames and deletes affect everyone
+    if created:
+        RoleClosure.objects.get_or_create(ancestor=instance, descendant=instance)
+    else:
+        transaction.on_commit(_role_renamed_or_deleted)
+
+
+
+def _hierarchy_changed():
+    rebuild_role_closure()
+    # only after the rebuild, so a token issued in between is not stamped current
+    bump_role_version()
+
+
+@receiver(post_save, sender=RoleImplication)
+@receiver(post_delete, sender=RoleImplication)
+def implication_changed(sender, instance, **kwargs):
+    # deferred: deleting a Role cascades here before the role row itself is gone
+    transaction.on_commit(_hierarchy_changed)
+
+
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+def permission_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_permissions)
+
+
+@receiver(post_save, sender=AccessPolicy)
+@receiver(post_delete, sender=AccessPolicy)
+def policy_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_policies)
+
+
+@receiver(post_save, sender=SecurityLabel)
+@receiver(post_delete, sender=SecurityLabel)
+def label_changed(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_labels)
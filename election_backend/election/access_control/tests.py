@@ -1,3 +1,330 @@
-from django.test import TestCase
+from datetime import datetime
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import caches
+from django.db import IntegrityError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from audit_logs.models import UserActivityLog
+from users.models import User
+
+from .bulk import decide_role_changes
+from .cache import get_version
+from .labels import dominates, filter_by_clearance
+from .matrix import _Matrix
+from .models import (
+    AccessPolicy, Permission, Role, RoleAssignment, RoleChangeRequest, RoleClosure, RoleImplication, RolePermission,
+    SecurityLabel,
+)
+from .policies import VERSION_KEY as POLICY_VERSION_KEY, PolicyError, compile_rules, is_allowed
+from .roles import has_role, is_admin, role_version, user_roles
+
+AUTHZ_LOCMEM = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'default'},
+    'authz': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'authz'},
+}
+
+
+def request_for(user):
+    request = RequestFactory().get('/')
+    request.user = user
+    return request
+
+
+class PermissionMatrixTests(TestCase):
+    def test_bits_are_dense_for_large_ids(self):
+        role = Role.objects.create(name='Officer', description='')
+        for perm_id, name in [(7, 'view'), (10 ** 9, 'vote'), (10 ** 9 + 5, 'view')]:
+            RolePermission.objects.create(role=role, permission=Permission.objects.create(id=perm_id, name=name, description=''))
+        matrix = _Matrix()
+        bits = matrix.bits_for(frozenset(['officer']))
+        self.assertEqual(bits, 0b111)
+        self.assertEqual(matrix.name_bits, {'view': 0b101, 'vote': 0b010})
+        self.assertEqual(matrix.names, ['view', 'vote', 'view'])
+
+
+class AuthzTestCase(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        caches['authz'].clear()
+
+    def role(self, name):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Role.objects.create(name=name, description='')
+
+    def assign(self, user, role):
+        with self.captureOnCommitCallbacks(execute=True):
+            return RoleAssignment.objects.create(user=user, role=role)
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class RoleCheckTests(AuthzTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('u', nid='1', phone='1')
+
+    def test_is_admin_accepts_staff_and_admin_role(self):
+        self.assertFalse(is_admin(request_for(self.user)))
+        staff = User.objects.create_user('staff', nid='2', phone='2', is_staff=True)
+        self.assertTrue(is_admin(request_for(staff)))
+        self.assign(self.user, self.role('Admin'))
+        self.assertTrue(is_admin(request_for(self.user)))
+
+    def test_role_names_are_case_insensitive(self):
+        self.assign(self.user, self.role('Officer'))
+        request = request_for(self.user)
+        self.assertTrue(has_role(request, 'officer'))
+        self.assertTrue(has_role(request, 'Admin', 'OFFICER'))
+        self.assertFalse(has_role(request, 'Admin'))
+
+    def test_roles_resolved_once_per_request(self):
+        self.assign(self.user, self.role('Officer'))
+        request = request_for(self.user)
+        with self.assertNumQueries(1):
+            for _ in range(3):
+                has_role(request, 'Admin')
+                is_admin(request)
+        # a second request reads the shared decision cache
+        with self.assertNumQueries(0):
+            has_role(request_for(self.user), 'Officer')
+
+    def test_anonymous_user_has_no_roles(self):
+        request = request_for(AnonymousUser())
+        self.assertEqual(user_roles(request), frozenset())
+        self.assertFalse(is_admin(request))
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class PolicyTests(AuthzTestCase):
+    def setUp(self):
+        super().setUp()
+        self.voter = User.objects.create_user('voter', nid='1', phone='1')
+        self.assign(self.voter, self.role('Voter'))
+        self.other = User.objects.create_user('other', nid='2', phone='2')
+
+    def policy(self, **rules):
+        with self.captureOnCommitCallbacks(execute=True):
+            AccessPolicy.objects.create(name='p', description='', rules=rules)
+
+    def at(self, hour):
+        return timezone.make_aware(datetime(2026, 1, 1, hour))
+
+    def test_allow_policy_guards_its_resource_only(self):
+        self.policy(resource='elections', action='vote', role='voter')
+        self.assertTrue(is_allowed(request_for(self.voter), 'elections', 'vote'))
+        self.assertFalse(is_allowed(request_for(self.other), 'elections', 'vote'))
+        self.assertTrue(is_allowed(request_for(self.other), 'elections', 'view'))
+
+    def test_deny_overrides_allow(self):
+        self.policy(resource='elections', action='*', role='voter')
+        self.policy(resource='*', action='vote', effect='deny', district=['North'])
+        self.assertFalse(is_allowed(request_for(self.voter), 'elections', 'vote', district='North'))
+        self.assertTrue(is_allowed(request_for(self.voter), 'elections', 'vote', district='South'))
+
+    def test_overnight_time_window(self):
+        self.policy(resource='elections', action='vote', time={'start': '22:00', 'end': '06:00'})
+        request = request_for(self.voter)
+        self.assertTrue(is_allowed(request, 'elections', 'vote', now=self.at(23)))
+        self.assertTrue(is_allowed(request, 'elections', 'vote', now=self.at(5)))
+        self.assertFalse(is_allowed(request, 'elections', 'vote', now=self.at(12)))
+
+    def test_policies_compiled_once_per_version(self):
+        self.policy(resource='elections', action='vote', effect='deny', district='North')
+        is_allowed(request_for(AnonymousUser()), 'elections', 'vote')
+        with self.assertNumQueries(0):
+            self.assertFalse(is_allowed(request_for(AnonymousUser()), 'elections', 'vote', district='North'))
+
+    def test_invalid_rules_rejected(self):
+        for rules in ({'resource': 'elections', 'colour': 'red'}, {'effect': 'maybe'}, {'time': {'start': 'noon'}}, []):
+            with self.assertRaises(PolicyError):
+                compile_rules(rules)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('admin', nid='3', phone='3', is_staff=True))
+        response = client.post('/api/access/policies/', {'name': 'p', 'description': '', 'rules': {'effect': 'maybe'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('rules', response.data)
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class RoleHierarchyTests(AuthzTestCase):
+    def setUp(self):
+        super().setUp()
+        self.admin, self.officer, self.voter = (self.role(name) for name in ('Admin', 'Officer', 'Voter'))
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('staff', nid='0', phone='0', is_staff=True))
+        self.user = User.objects.create_user('u', nid='1', phone='1')
+        self.assign(self.user, self.admin)
+
+    def imply(self, parent, child):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/access/roles/implications/', {'parent': parent.pk, 'child': child.pk})
+
+    def test_implied_roles_are_inherited_transitively(self):
+        self.assertEqual(self.imply(self.admin, self.officer).status_code, 201)
+        self.assertEqual(self.imply(self.officer, self.voter).status_code, 201)
+        self.assertEqual(user_roles(request_for(self.user)), frozenset(['admin', 'officer', 'voter']))
+        self.assertEqual(RoleClosure.objects.get(ancestor=self.admin, descendant=self.voter).depth, 2)
+
+    def test_cycle_rejected(self):
+        self.imply(self.admin, self.officer)
+        self.imply(self.officer, self.voter)
+        response = self.imply(self.voter, self.admin)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.imply(self.voter, self.voter).status_code, 400)
+
+    def test_removing_an_implication_revokes_inherited_roles(self):
+        self.imply(self.admin, self.officer)
+        self.assertTrue(has_role(request_for(self.user), 'Officer'))
+        implication = RoleImplication.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'/api/access/roles/implications/{implication.pk}/').status_code, 204)
+        self.assertFalse(has_role(request_for(self.user), 'Officer'))
+        self.assertFalse(RoleClosure.objects.filter(ancestor=self.admin, descendant=self.officer).exists())
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class SecurityLabelTests(AuthzTestCase):
+    def labels(self, **levels):
+        with self.captureOnCommitCallbacks(execute=True):
+            for name, level in levels.items():
+                SecurityLabel.objects.create(name=name, description='', level=level)
+
+    def log(self, label):
+        return UserActivityLog.objects.create(action='a', resource='r', ip_address='10.0.0.1', security_label=label)
+
+    def test_dominance_follows_levels(self):
+        self.labels(Public=0, Internal=1, Restricted=1, Confidential=2)
+        self.assertTrue(dominates('Confidential', 'Internal'))
+        self.assertTrue(dominates('internal', 'RESTRICTED'))
+        self.assertFalse(dominates('Internal', 'Confidential'))
+        self.assertTrue(dominates('Public', ''))
+        # an unknown label only sees unlabelled data, and nobody is cleared for it
+        self.assertTrue(dominates('Secret', ''))
+        self.assertFalse(dominates('Secret', 'Public'))
+        self.assertFalse(dominates('Confidential', 'Secret'))
+
+    def test_new_label_seen_after_commit(self):
+        self.labels(Public=0)
+        self.assertFalse(dominates('Public', 'Internal'))
+        self.labels(Internal=0)
+        self.assertTrue(dominates('Public', 'Internal'))
+
+    def test_filter_by_clearance(self):
+        logs = {label: self.log(label) for label in ('', 'public', 'Internal', 'Confidential')}
+        user = User(clearance_label='Internal')
+        # no labels defined: every row is visible
+        self.assertEqual(filter_by_clearance(UserActivityLog.objects.all(), user).count(), 4)
+        self.labels(Public=0, Internal=1, Confidential=2)
+        visible = set(filter_by_clearance(UserActivityLog.objects.all(), user).values_list('pk', flat=True))
+        self.assertEqual(visible, {logs[''].pk, logs['public'].pk, logs['Internal'].pk})
+
+    def test_labels_listed_by_level(self):
+        self.labels(Confidential=2, Public=0, Internal=1)
+        names = [label['name'] for label in APIClient().get('/api/access/labels/').data]
+        self.assertEqual(names, ['Public', 'Internal', 'Confidential'])
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class BulkRoleTests(AuthzTestCase):
+    def setUp(self):
+        super().setUp()
+        self.officer, self.voter = self.role('Officer'), self.role('Voter')
+        self.caller = User.objects.create_user('officer', nid='0', phone='0')
+        self.assign(self.caller, self.officer)
+        self.users = [User.objects.create_user(f'u{i}', nid=str(i + 1), phone=str(i + 1)) for i in range(2)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.caller)
+
+    def post(self, url, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, format='json')
+
+    def test_bulk_assign_reports_each_item(self):
+        a, b = self.users
+        self.assign(b, self.voter)
+        self.assertFalse(has_role(request_for(a), 'Voter'))
+        response = self.post('/api/access/assign-role/bulk/', {'assignments': [
+            {'user': a.pk, 'role': self.voter.pk},
+            {'user': a.pk, 'role': self.voter.pk},
+            {'user': b.pk, 'role': self.voter.pk},
+            {'user': 999, 'role': self.voter.pk},
+            {'user': a.pk, 'role': 999},
+        ]})
+        self.assertEqual(response.status_code, 200)
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, ['assigned', 'duplicate', 'exists', 'invalid', 'invalid'])
+        self.assertEqual(RoleAssignment.objects.filter(user=a).count(), 1)
+        # bulk_create sends no signals; the role version is bumped by the bulk path itself
+        self.assertTrue(has_role(request_for(a), 'Voter'))
+
+    def test_bulk_assign_requires_officer_or_admin(self):
+        self.client.force_authenticate(self.users[0])
+        response = self.post('/api/access/assign-role/bulk/', {'assignments': [{'user': self.users[0].pk, 'role': self.officer.pk}]})
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(RoleAssignment.objects.filter(user=self.users[0]).exists())
+
+    def request_change(self, user):
+        return RoleChangeRequest.objects.create(user=user, requested_role=self.voter)
+
+    def test_bulk_approve(self):
+        first, second = (self.request_change(user) for user in self.users)
+        self.assign(self.users[1], self.voter)
+        self.assertFalse(has_role(request_for(self.users[0]), 'Voter'))
+        response = self.post('/api/access/approve-role-change/bulk/', {'ids': [first.pk, second.pk, first.pk, 999], 'action': 'approve'})
+        statuses = [r['status'] for r in response.data['results']]
+        self.assertEqual(statuses, [RoleChangeRequest.APPROVED, RoleChangeRequest.APPROVED, 'already_processed', 'not_found'])
+        self.assertTrue(has_role(request_for(self.users[0]), 'Voter'))
+        # the role already held is not assigned twice
+        self.assertEqual(RoleAssignment.objects.filter(user=self.users[1], role=self.voter).count(), 1)
+
+    def test_failed_bulk_approve_rolls_back(self):
+        requests = [self.request_change(user) for user in self.users]
+        with mock.patch.object(RoleAssignment.objects, 'bulk_create', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                decide_role_changes([r.pk for r in requests], 'approve', self.caller)
+        self.assertEqual(set(RoleChangeRequest.objects.values_list('status', flat=True)), {RoleChangeRequest.REQUESTED})
+        self.assertFalse(RoleAssignment.objects.filter(user__in=self.users).exists())
+
+
+@override_settings(CACHES=AUTHZ_LOCMEM, AUTHZ_CACHE='authz')
+class AuthzCacheTests(TestCase):
+    def setUp(self):
+        caches['authz'].clear()
+        self.user = User.objects.create_user('u', nid='1', phone='1')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.officer = Role.objects.create(name='Officer', description='')
+
+    def test_assignment_write_invalidates_cached_roles(self):
+        version = role_version(self.user.pk)
+        self.assertEqual(user_roles(request_for(self.user)), frozenset())
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment = RoleAssignment.objects.create(user=self.user, role=self.officer)
+        self.assertNotEqual(role_version(self.user.pk), version)
+        self.assertEqual(user_roles(request_for(self.user)), frozenset(['officer']))
+        with self.captureOnCommitCallbacks(execute=True):
+            assignment.delete()
+        self.assertEqual(user_roles(request_for(self.user)), frozenset())
+
+    def test_policy_write_invalidates_compiled_policies(self):
+        version = get_version(POLICY_VERSION_KEY)
+        self.assertTrue(is_allowed(request_for(self.user), 'elections', 'vote'))
+        with self.captureOnCommitCallbacks(execute=True):
+            policy = AccessPolicy.objects.create(name='p', description='', rules={'resource': 'elections', 'effect': 'deny'})
+        self.assertNotEqual(get_version(POLICY_VERSION_KEY), version)
+        self.assertFalse(is_allowed(request_for(self.user), 'elections', 'vote'))
+        with self.captureOnCommitCallbacks(execute=True):
+            policy.delete()
+        self.assertTrue(is_allowed(request_for(self.user), 'elections', 'vote'))
+
+    def test_versions_bumped_only_after_commit(self):
+        version = role_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            RoleAssignment.objects.create(user=self.user, role=self.officer)
+            # a worker reading now still sees the old rows, so it must not see a new version
+            self.assertEqual(role_version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(role_version(self.user.pk), version)
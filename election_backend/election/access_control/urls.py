@@ -4,10 +4,15 @@ from . import views
 urlpatterns = [
     path('roles/', views.RolesView.as_view(), name='access-roles'),
     path('roles/<int:pk>/', views.RoleDetailView.as_view(), name='access-role-detail'),
+    path('roles/implications/', views.RoleImplicationsView.as_view(), name='access-role-implications'),
+    path('roles/implications/<int:pk>/', views.RoleImplicationDetailView.as_view(), name='access-role-implication-detail'),
     path('permissions/', views.PermissionsView.as_view(), name='access-permissions'),
+    path('permissions/effective/', views.EffectivePermissionsView.as_view(), name='access-effective-permissions'),
     path('assign-role/', views.AssignRoleView.as_view(), name='access-assign-role'),
+    path('assign-role/bulk/', views.BulkAssignRoleView.as_view(), name='access-assign-role-bulk'),
     path('request-role-change/', views.RequestRoleChangeView.as_view(), name='access-request-role-change'),
     path('approve-role-change/', views.ApproveRoleChangeView.as_view(), name='access-approve-role-change'),
+    path('approve-role-change/bulk/', views.BulkApproveRoleChangeView.as_view(), name='access-approve-role-change-bulk'),
     path('policies/', views.PoliciesView.as_view(), name='access-policies'),
     path('labels/', views.LabelsView.as_view(), name='access-labels'),
 ]
@@ -6,19 +6,21 @@ from django.shortcuts import get_object_or_404
 from drf_yasg.utils import swagger_auto_schema
 from django.utils import timezone
 
-from .models import Role, Permission, RoleAssignment, RoleChangeRequest, AccessPolicy, SecurityLabel
+from .models import Role, Permission, RoleAssignment, RoleChangeRequest, AccessPolicy, SecurityLabel, RoleImplication
 from .serializers import (
 	RoleSerializer,
+	RoleImplicationSerializer,
 	PermissionSerializer,
 	RoleAssignmentSerializer,
+	BulkRoleAssignmentSerializer,
 	RoleChangeRequestSerializer,
+	BulkRoleChangeDecisionSerializer,
 	AccessPolicySerializer,
 	SecurityLabelSerializer,
 )
-
-
-def _user_has_role(user, role_name):
-	return RoleAssignment.objects.filter(user=user, role__name__iexact=role_name).exists()
+from .bulk import assign_roles, decide_role_changes
+from .matrix import effective_permissions
+from .roles import has_role
 
 
 class RolesView(APIView):
@@ -68,6 +70,38 @@ class RoleDetailView(APIView):
 		return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class RoleImplicationsView(APIView):
+	permission_classes = (AllowAny,)
+
+	def get(self, request):
+		implications = RoleImplication.objects.all()
+		serializer = RoleImplicationSerializer(implications, many=True)
+		return Response(serializer.data)
+
+	@swagger_auto_schema(request_body=RoleImplicationSerializer)
+	def post(self, request):
+		# admin-only; the closure table is rebuilt by a signal
+		if not request.user.is_authenticated or not (request.user.is_staff or request.user.is_superuser):
+			return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
+
+		serializer = RoleImplicationSerializer(data=request.data)
+		if serializer.is_valid():
+			serializer.save()
+			return Response(serializer.data, status=status.HTTP_201_CREATED)
+		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class RoleImplicationDetailView(APIView):
+	permission_classes = (AllowAny,)
+
+	def delete(self, request, pk):
+		if not request.user.is_authenticated or not (request.user.is_staff or request.user.is_superuser):
+			return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
+		implication = get_object_or_404(RoleImplication, pk=pk)
+		implication.delete()
+		return Response(status=status.HTTP_204_NO_CONTENT)
+
+
 class PermissionsView(APIView):
 	permission_classes = (AllowAny,)
 
@@ -77,13 +111,21 @@ class PermissionsView(APIView):
 		return Response(serializer.data)
 
 
+class EffectivePermissionsView(APIView):
+	permission_classes = (IsAuthenticated,)
+
+	def get(self, request):
+		# OR of the caller's role bitsets, no joins
+		return Response({'permissions': effective_permissions(request)})
+
+
 class AssignRoleView(APIView):
 	permission_classes = (IsAuthenticated,)
 
 	@swagger_auto_schema(request_body=RoleAssignmentSerializer)
 	def post(self, request):
 		# only Admin or Officer
-		if not (_user_has_role(request.user, 'Admin') or _user_has_role(request.user, 'Officer')):
+		if not has_role(request, 'Admin', 'Officer'):
 			return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
 
 		serializer = RoleAssignmentSerializer(data=request.data)
@@ -93,6 +135,23 @@ class AssignRoleView(APIView):
 		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class BulkAssignRoleView(APIView):
+	permission_classes = (IsAuthenticated,)
+
+	@swagger_auto_schema(request_body=BulkRoleAssignmentSerializer)
+	def post(self, request):
+		# only Admin or Officer
+		if not has_role(request, 'Admin', 'Officer'):
+			return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
+
+		serializer = BulkRoleAssignmentSerializer(data=request.data)
+		if not serializer.is_valid():
+			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+		pairs = [(item['user'], item['role']) for item in serializer.validated_data['assignments']]
+		return Response({'results': assign_roles(pairs)})
+
+
 class RequestRoleChangeView(APIView):
 	permission_classes = (IsAuthenticated,)
 
@@ -114,7 +173,7 @@ class ApproveRoleChangeView(APIView):
 	@swagger_auto_schema(request_body=RoleChangeRequestSerializer)
 	def post(self, request):
 		# only Officer can approve
-		if not _user_has_role(request.user, 'Officer'):
+		if not has_role(request, 'Officer'):
 			return Response({'detail': 'officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
 
 		req_id = request.data.get('id')
@@ -139,6 +198,23 @@ class ApproveRoleChangeView(APIView):
 		return Response(RoleChangeRequestSerializer(r).data)
 
 
+class BulkApproveRoleChangeView(APIView):
+	permission_classes = (IsAuthenticated,)
+
+	@swagger_auto_schema(request_body=BulkRoleChangeDecisionSerializer)
+	def post(self, request):
+		# only Officer can approve
+		if not has_role(request, 'Officer'):
+			return Response({'detail': 'officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
+
+		serializer = BulkRoleChangeDecisionSerializer(data=request.data)
+		if not serializer.is_valid():
+			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+		data = serializer.validated_data
+		return Response({'results': decide_role_changes(data['ids'], data['action'], request.user)})
+
+
 class PoliciesView(APIView):
 	permission_classes = (AllowAny,)
 
@@ -164,6 +240,18 @@ class LabelsView(APIView):
 	permission_classes = (AllowAny,)
 
 	def get(self, request):
-		labels = SecurityLabel.objects.all()
+		labels = SecurityLabel.objects.order_by('level', 'name')
 		serializer = SecurityLabelSerializer(labels, many=True)
 		return Response(serializer.data)
+
+	@swagger_auto_schema(request_body=SecurityLabelSerializer)
+	def post(self, request):
+		# admin only; the dominance matrix is refreshed by a signal
+		if not request.user.is_authenticated or not (request.user.is_staff or request.user.is_superuser):
+			return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
+
+		serializer = SecurityLabelSerializer(data=request.data)
+		if serializer.is_valid():
+			serializer.save()
+			return Response(serializer.data, status=status.HTTP_201_CREATED)
+		return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audit_logs', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemeventlog',
+            name='security_label',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='useractivitylog',
+            name='security_label',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=50),
+        ),
+    ]
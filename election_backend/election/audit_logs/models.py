@@ -7,8 +7,11 @@ class UserActivityLog(models.Model):
     resource = models.CharField(max_length=100)
     ip_address = models.GenericIPAddressField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # SecurityLabel name; blank rows are visible to every clearance
+    security_label = models.CharField(max_length=50, blank=True, default='', db_index=True)
 
 class SystemEventLog(models.Model):
     event_type = models.CharField(max_length=100)
     description = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    security_label = models.CharField(max_length=50, blank=True, default='', db_index=True)
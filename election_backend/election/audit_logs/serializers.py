@@ -5,13 +5,13 @@ from .models import UserActivityLog, SystemEventLog
 class UserActivityLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = UserActivityLog
-        fields = ('id', 'user', 'action', 'resource', 'ip_address', 'timestamp')
+        fields = ('id', 'user', 'action', 'resource', 'ip_address', 'timestamp', 'security_label')
 
 
 class SystemEventLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = SystemEventLog
-        fields = ('id', 'event_type', 'description', 'timestamp')
+        fields = ('id', 'event_type', 'description', 'timestamp', 'security_label')
 
 
 class DecryptLogsRequestSerializer(serializers.Serializer):
@@ -12,11 +12,8 @@ from .serializers import (
 	SystemEventLogSerializer,
 	DecryptLogsRequestSerializer,
 )
-from access_control.models import RoleAssignment
-
-
-def _user_is_admin(user):
-	return user.is_authenticated and (user.is_staff or user.is_superuser or RoleAssignment.objects.filter(user=user, role__name__iexact='Admin').exists())
+from access_control.labels import filter_by_clearance
+from access_control.roles import is_admin
 
 
 class UserActivityLogsView(APIView):
@@ -24,7 +21,7 @@ class UserActivityLogsView(APIView):
 
 	def get(self, request):
 		# filter by user, date range, action
-		qs = UserActivityLog.objects.all()
+		qs = filter_by_clearance(UserActivityLog.objects.all(), request.user)
 		user_id = request.query_params.get('user')
 		action = request.query_params.get('action')
 		start = request.query_params.get('start')
@@ -46,7 +43,7 @@ class SystemEventLogsView(APIView):
 	permission_classes = (IsAuthenticated,)
 
 	def get(self, request):
-		qs = SystemEventLog.objects.all()
+		qs = filter_by_clearance(SystemEventLog.objects.all(), request.user)
 		start = request.query_params.get('start')
 		end = request.query_params.get('end')
 		if start:
@@ -97,7 +94,7 @@ class DecryptLogsView(APIView):
 	@swagger_auto_schema(request_body=DecryptLogsRequestSerializer)
 	def post(self, request):
 		# Only admins can request decryption
-		if not _user_is_admin(request.user):
+		if not is_admin(request):
 			return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
 
 		# Accept optional filters in the request body
@@ -106,7 +103,7 @@ class DecryptLogsView(APIView):
 			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 		params = serializer.validated_data
-		qs = UserActivityLog.objects.order_by('-timestamp')
+		qs = filter_by_clearance(UserActivityLog.objects.order_by('-timestamp'), request.user)
 		user_id = params.get('user')
 		start = params.get('start')
 		end = params.get('end')
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from users.models import SlimUser
+
+from .cache import get_user_version
+
+RECORD_KEY = 'auth:user:%s:%s'
+
+# what authorization on the request path reads; anything else loads lazily
+SLIM_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser', 'clearance_label')
+# in model order, as Model.from_db expects
+_ATTNAMES = tuple(f.attname for f in SlimUser._meta.concrete_fields if f.attname in SLIM_FIELDS)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that builds ``request.user`` from a cached slim record.
+
+    The record is keyed by user id and a version bumped whenever the user is
+    saved or deleted, and lives for ``AUTH_USER_CACHE_TIMEOUT`` seconds to
+    bound staleness from queryset ``update()`` calls, which send no signal.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # needs the password hash, which the slim record leaves out
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        key = RECORD_KEY % (user_id, get_user_version(user_id))
+        values = cache.get(key)
+        if values is None:
+            values = SlimUser.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*_ATTNAMES).first()
+            if values is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(key, values, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        user = SlimUser.from_db('default', _ATTNAMES, values)
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
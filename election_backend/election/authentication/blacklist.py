@@ -0,0 +1,138 @@
+"""Per-process bloom filter of blacklisted refresh-token JTIs.
+
+A negative answer is exact, so a refresh whose JTI is not in the filter skips
+the ``token_blacklist`` query; a positive answer (a real hit or a false
+positive) falls through to the database.
+
+The filter is built from the table on first use and kept current
+incrementally: every committed `BlacklistedToken` writes a fresh clock stamp
+to a cache key, and a process whose last-seen stamp differs pulls the new rows.
+A stamp rather than ``incr``: on the file cache ``incr`` is a read-modify-write,
+so two concurrent revocations could both write the same value, and a process
+that synced after the first would never pull the second.
+`prune_tokens` bumps a generation key so processes rebuild and shed the bits
+of deleted rows.
+
+Ids are allocated before commit, so with concurrent writers a row can become
+visible after rows with higher ids; pulling only above the highest id seen
+would miss it for good. Each pull therefore rescans every row blacklisted in
+the last ``JWT_BLACKLIST_COMMIT_MARGIN`` seconds (by then every earlier
+transaction has committed), skipping the ones already added.
+"""
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+COUNTER_KEY = 'auth:blacklist:counter'
+GENERATION_KEY = 'auth:blacklist:generation'
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for pos in self._positions(value):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(value))
+
+
+def _seeded(key):
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, time.time_ns(), None)
+        value = cache.get(key)
+    return value
+
+
+class _BlacklistFilter:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._bloom = None
+        # every row at or below this id has been added; rows above it are rescanned
+        self._floor = 0
+        # ids above the floor that are already in the filter
+        self._recent = set()
+        self._counter = None
+        self._generation = None
+
+    def _rebuild(self, generation):
+        capacity = max(settings.JWT_BLACKLIST_BLOOM_CAPACITY, 2 * BlacklistedToken.objects.count())
+        self._bloom = BloomFilter(capacity, settings.JWT_BLACKLIST_BLOOM_ERROR_RATE)
+        self._floor = 0
+        self._recent = set()
+        self._generation = generation
+
+    @staticmethod
+    def _settled_floor():
+        # highest id blacklisted before the margin; every row at or below it has committed.
+        # Walks down the primary key from the top, so only recent rows are read.
+        cutoff = timezone.now() - timedelta(seconds=settings.JWT_BLACKLIST_COMMIT_MARGIN)
+        return BlacklistedToken.objects.filter(blacklisted_at__lt=cutoff).order_by('-id').values_list('id', flat=True).first() or 0
+
+    def _pull(self):
+        # taken before the scan, so every row at or below it is visible to the scan
+        floor = max(self._floor, self._settled_floor())
+        rows = BlacklistedToken.objects.filter(id__gt=self._floor).order_by('id').values_list('id', 'token__jti')
+        for row_id, jti in rows.iterator(chunk_size=5000):
+            if row_id in self._recent:
+                continue
+            self._bloom.add(jti)
+            if row_id > floor:
+                self._recent.add(row_id)
+        self._floor = floor
+        self._recent = {row_id for row_id in self._recent if row_id > floor}
+
+    def sync(self):
+        counter = _seeded(COUNTER_KEY)
+        generation = _seeded(GENERATION_KEY)
+        if counter == self._counter and generation == self._generation:
+            return
+        with self._lock:
+            if generation != self._generation or self._bloom.count > self._bloom.capacity:
+                self._rebuild(generation)
+            # read the counter before pulling: a bump that races the pull triggers another pull
+            self._counter = counter
+            self._pull()
+
+    def might_contain(self, jti):
+        self.sync()
+        return jti in self._bloom
+
+
+blacklist_filter = _BlacklistFilter()
+
+
+def might_be_blacklisted(jti):
+    """False means ``jti`` is certainly not blacklisted; True means ask the database."""
+    return blacklist_filter.might_contain(jti)
+
+
+def blacklist_changed():
+    """Tell every process a token was blacklisted; called once the BlacklistedToken row has committed."""
+    cache.set(COUNTER_KEY, time.time_ns(), None)
+
+
+def blacklist_pruned():
+    """Make every process rebuild its filter without the pruned rows."""
+    cache.set(GENERATION_KEY, time.time_ns(), None)
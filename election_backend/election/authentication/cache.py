@@ -0,0 +1,19 @@
+import time
+
+from django.core.cache import cache
+
+USER_VERSION_KEY = 'auth:user:version:%s'
+
+
+def get_user_version(user_id):
+    key = USER_VERSION_KEY % user_id
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_user_version(user_id):
+    """Invalidate the cached slim record of ``user_id`` in every process."""
+    cache.set(USER_VERSION_KEY % user_id, time.time_ns(), None)
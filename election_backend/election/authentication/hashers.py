@@ -0,0 +1,91 @@
+"""Password hashing on a bounded worker pool.
+
+PBKDF2 spends its time inside hashlib, which releases the GIL, so a small pool
+of threads can keep every core busy while request threads wait. The pool is
+bounded twice: ``PASSWORD_HASH_WORKERS`` threads run hashes and at most
+``PASSWORD_HASH_QUEUE`` more may wait for one. A request that cannot get a
+slot within ``PASSWORD_HASH_WAIT`` seconds fails fast with 503 instead of
+piling onto a saturated CPU. DRF renders `HashingBusy` itself;
+`HashingBusyMiddleware` does the same for plain Django views such as the
+admin login.
+"""
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.core.signals import setting_changed
+from django.http import HttpResponse
+from django.dispatch import receiver
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'authentication is busy, retry shortly'
+    default_code = 'hashing_busy'
+
+
+class HashingBusyMiddleware:
+    """Answer `HashingBusy` raised outside DRF with 503 instead of a server error."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        return self.get_response(request)
+
+    def process_exception(self, request, exception):
+        if isinstance(exception, HashingBusy):
+            response = HttpResponse(HashingBusy.default_detail, status=HashingBusy.status_code, content_type='text/plain')
+            response['Retry-After'] = str(max(1, round(settings.PASSWORD_HASH_WAIT)))
+            return response
+        return None
+
+
+class _HashPool:
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+
+    def run(self, fn, *args):
+        if not self.slots.acquire(timeout=settings.PASSWORD_HASH_WAIT):
+            raise HashingBusy()
+        try:
+            return self.executor.submit(fn, *args).result()
+        finally:
+            self.slots.release()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def hash_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+                _pool = _HashPool(workers, settings.PASSWORD_HASH_QUEUE)
+    return _pool
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    # lets tests and bench_login resize the pool with override_settings
+    global _pool
+    if setting in ('PASSWORD_HASH_WORKERS', 'PASSWORD_HASH_QUEUE'):
+        with _pool_lock:
+            old, _pool = _pool, None
+        if old is not None:
+            old.executor.shutdown(wait=False)
+
+
+class BoundedPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 run on the shared hash pool; reads and writes the same hashes as Django's."""
+
+    def encode(self, password, salt, iterations=None):
+        return hash_pool().run(super().encode, password, salt, iterations)
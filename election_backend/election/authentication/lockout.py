@@ -0,0 +1,195 @@
+"""Login lockout from sliding-window failure counters in the cache.
+
+Each counter is a pair of fixed buckets (current and previous window); the
+previous bucket is weighted by how much of it still overlaps the sliding
+window. Counters are kept per login identifier and per client IP, so a
+locked-out attempt is rejected with one cache read, before any user lookup or
+password hash.
+
+The identifier is the submitted username, because that is the only field the
+token serializer authenticates on (``User.USERNAME_FIELD``); keying on
+anything else the client sends would let it pick a fresh counter per guess.
+The IP is ``REMOTE_ADDR`` unless ``REST_FRAMEWORK['NUM_PROXIES']`` says how
+many X-Forwarded-For entries were added by trusted proxies.
+
+`FailedLoginAttempt` rows are still written for the audit trail, but from a
+background thread in batches instead of one INSERT per failure.
+"""
+import atexit
+import hashlib
+import logging
+import math
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections
+from rest_framework.settings import api_settings
+
+from users.models import User
+
+from .models import FailedLoginAttempt
+
+logger = logging.getLogger(__name__)
+
+KEY = 'auth:failures:%s:%s:%s'
+
+IDENTIFIER = 'id'
+IP = 'ip'
+
+
+def normalize_identifier(username):
+    """The counter key for a login: the submitted username."""
+    return (username or '').strip()
+
+
+def client_ip(request):
+    """The client address, trusting only the X-Forwarded-For entries of NUM_PROXIES proxies."""
+    remote_addr = request.META.get('REMOTE_ADDR')
+    xff = request.META.get('HTTP_X_FORWARDED_FOR')
+    num_proxies = api_settings.NUM_PROXIES
+    if not num_proxies or not xff:
+        return remote_addr
+    addrs = [addr.strip() for addr in xff.split(',')]
+    # the rightmost entries were appended by our own proxies; anything left of them is client-supplied
+    return addrs[-min(num_proxies, len(addrs))]
+
+
+def _keys(kind, value, now):
+    # identifiers are attacker-chosen strings; hash them into safe cache keys
+    digest = hashlib.sha1(value.encode()).hexdigest()
+    bucket = int(now // settings.LOGIN_LOCKOUT_WINDOW)
+    return KEY % (kind, digest, bucket), KEY % (kind, digest, bucket - 1)
+
+
+def _weighted(counts, keys, now):
+    window = settings.LOGIN_LOCKOUT_WINDOW
+    overlap = 1 - (now % window) / window
+    current, previous = keys
+    return counts.get(current, 0) + counts.get(previous, 0) * overlap
+
+
+def _targets(identifier, ip):
+    targets = []
+    if identifier:
+        targets.append((IDENTIFIER, identifier, settings.LOGIN_LOCKOUT_THRESHOLD))
+    if ip:
+        targets.append((IP, ip, settings.LOGIN_LOCKOUT_IP_THRESHOLD))
+    return targets
+
+
+def failure_counts(identifier, ip, now=None):
+    """Return ``{'id': n, 'ip': n}`` sliding-window failure counts (one cache read)."""
+    now = time.time() if now is None else now
+    keyed = [(kind, _keys(kind, value, now)) for kind, value, _ in _targets(identifier, ip)]
+    counts = cache.get_many([key for _, keys in keyed for key in keys])
+    return {kind: _weighted(counts, keys, now) for kind, keys in keyed}
+
+
+def locked_for(identifier, ip, now=None):
+    """Seconds until a login for ``identifier`` from ``ip`` may be tried again; 0 if not locked."""
+    now = time.time() if now is None else now
+    counts = failure_counts(identifier, ip, now)
+    for kind, _, threshold in _targets(identifier, ip):
+        if counts[kind] >= threshold:
+            window = settings.LOGIN_LOCKOUT_WINDOW
+            # the weighted count only falls once the current bucket rolls over
+            return max(1, math.ceil(window - now % window))
+    return 0
+
+
+def record_failure(identifier, ip):
+    """Count a failed login against ``identifier`` and ``ip`` and queue its audit row."""
+    now = time.time()
+    timeout = 2 * settings.LOGIN_LOCKOUT_WINDOW
+    for kind, value, _ in _targets(identifier, ip):
+        key = _keys(kind, value, now)[0]
+        if not cache.add(key, 1, timeout):
+            try:
+                cache.incr(key)
+            except ValueError:
+                # expired between add and incr
+                cache.add(key, 1, timeout)
+    _writer.submit(identifier, ip)
+
+
+def clear_failures(identifier):
+    """Forget the identifier's failures after a successful login; the IP counter stays."""
+    if identifier:
+        cache.delete_many(_keys(IDENTIFIER, identifier, time.time()))
+
+
+class _AttemptWriter:
+    """Batches FailedLoginAttempt inserts on a daemon thread."""
+
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, identifier, ip):
+        if identifier and ip:
+            self._queue.put((identifier, ip))
+            self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='failed-login-writer', daemon=True)
+                    self._thread.start()
+
+    def _take_batch(self, timeout):
+        batch = []
+        try:
+            batch.append(self._queue.get(timeout=timeout))
+            while len(batch) < settings.LOGIN_FAILURE_BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch(timeout=None)
+            # give a burst a moment to fill the batch
+            time.sleep(settings.LOGIN_FAILURE_FLUSH_INTERVAL)
+            batch += self._take_batch(timeout=0)
+            try:
+                self.write(batch)
+            except Exception:
+                logger.exception('could not record %d failed login attempts', len(batch))
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        """Write everything queued so far in the calling thread."""
+        while True:
+            batch = self._take_batch(timeout=0)
+            if not batch:
+                return
+            self.write(batch)
+
+    @staticmethod
+    def write(batch):
+        """Insert one FailedLoginAttempt per entry whose identifier names a user."""
+        identifiers = {identifier for identifier, _ in batch}
+        users = dict(User.objects.filter(username__in=identifiers).values_list('username', 'id'))
+        FailedLoginAttempt.objects.bulk_create([
+            FailedLoginAttempt(user_id=users[identifier], ip_address=ip)
+            for identifier, ip in batch
+            if identifier in users
+        ])
+
+
+_writer = _AttemptWriter()
+
+
+@atexit.register
+def _flush_on_exit():
+    try:
+        _writer.flush()
+    except Exception:
+        logger.exception('could not flush failed login attempts on exit')
@@ -0,0 +1,88 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+
+from authentication import lockout
+from authentication.views import LoginView
+from users.models import User
+
+PREFIX = 'bench-login-'
+# User.phone holds 15 characters
+PHONE_PREFIX = 'bench'
+PASSWORD = 'bench-password'
+
+
+def _csv(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class Command(BaseCommand):
+    help = ('Measure LoginView throughput and latency for each hasher and hash-pool size. '
+            'Creates temporary bench-login-* users and deletes them afterwards. Rate limits are '
+            'switched off for the run, so the numbers measure login and not the throttle.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hashers', type=_csv,
+                            default=['authentication.hashers.BoundedPBKDF2PasswordHasher',
+                                     'django.contrib.auth.hashers.PBKDF2PasswordHasher'],
+                            help='Comma-separated hasher classes to compare.')
+        parser.add_argument('--workers', type=lambda v: [int(n) for n in _csv(v)], default=[1, 2, 4],
+                            help='Comma-separated PASSWORD_HASH_WORKERS values (bounded hasher only).')
+        parser.add_argument('--requests', type=int, default=200, help='Logins per run.')
+        parser.add_argument('--concurrency', type=int, default=16, help='Client threads per run.')
+        parser.add_argument('--users', type=int, default=20)
+
+    def handle(self, *args, **options):
+        User.objects.filter(username__startswith=PREFIX).delete()
+        User.objects.bulk_create([
+            User(username=f'{PREFIX}{i}', nid=f'{PREFIX}{i}', phone=f'{PHONE_PREFIX}{i:010d}', email=f'{PREFIX}{i}@bench.invalid')
+            for i in range(options['users'])
+        ])
+        try:
+            self.stdout.write(f"{'hasher':<60} {'workers':>7} {'logins/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'429s':>6} {'errors':>6}")
+            for hasher in options['hashers']:
+                bounded = hasher.endswith('BoundedPBKDF2PasswordHasher')
+                for workers in (options['workers'] if bounded else [None]):
+                    with override_settings(PASSWORD_HASHERS=[hasher], PASSWORD_HASH_WORKERS=workers, AUTH_RATE_LIMITS={}):
+                        User.objects.filter(username__startswith=PREFIX).update(password=make_password(PASSWORD))
+                        for i in range(options['users']):
+                            lockout.clear_failures(f'{PREFIX}{i}')
+                        rate, p50, p99, throttled, errors = self._run(options['requests'], options['concurrency'], options['users'])
+                    self.stdout.write(f"{hasher:<60} {workers or '-':>7} {rate:>9.1f} {p50:>8.1f} {p99:>8.1f} {throttled:>6} {errors:>6}")
+                    if throttled:
+                        raise CommandError(f'{throttled} logins were answered 429; the numbers above measure rate limiting, not login')
+        finally:
+            User.objects.filter(username__startswith=PREFIX).delete()
+
+    def _run(self, requests, concurrency, users):
+        factory = APIRequestFactory()
+        view = LoginView.as_view()
+
+        def login(i):
+            request = factory.post('/api/auth/login/', {'username': f'{PREFIX}{i % users}', 'password': PASSWORD},
+                                   format='json', REMOTE_ADDR=f'10.0.{i // 250 % 250}.{i % 250}')
+            started = time.perf_counter()
+            try:
+                response = view(request)
+            finally:
+                close_old_connections()
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as clients:
+            results = list(clients.map(login, range(requests)))
+        elapsed = time.perf_counter() - started
+
+        latencies = sorted(latency for latency, _ in results)
+        throttled = sum(1 for _, code in results if code == 429)
+        errors = sum(1 for _, code in results if code not in (200, 429))
+
+        def pct(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return requests / elapsed, pct(0.50), pct(0.99), throttled, errors
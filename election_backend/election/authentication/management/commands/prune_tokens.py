@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from authentication.blacklist import blacklist_pruned
+
+
+class Command(BaseCommand):
+    help = ('Delete expired outstanding and blacklisted refresh tokens in small chunks. '
+            'Unlike flushexpiredtokens, each chunk is its own short transaction.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks to leave room for other writers.')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        expired = OutstandingToken.objects.filter(expires_at__lt=now).order_by('id')
+        total = 0
+        while True:
+            ids = list(expired.values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                BlacklistedToken.objects.filter(token_id__in=ids).delete()
+                OutstandingToken.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        if total:
+            # processes rebuild their bloom filters without the pruned JTIs
+            blacklist_pruned()
+        self.stdout.write(self.style.SUCCESS(f'pruned {total} expired tokens'))
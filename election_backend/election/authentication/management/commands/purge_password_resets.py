@@ -0,0 +1,34 @@
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from authentication.models import PasswordReset
+
+
+class Command(BaseCommand):
+    help = ('Delete used and expired password reset codes in small chunks, '
+            'each its own short transaction. Meant to run from cron.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=settings.PASSWORD_RESET_PURGE_CHUNK_SIZE)
+        parser.add_argument('--sleep', type=float, default=0.0,
+                            help='Seconds to pause between chunks to leave room for other writers.')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(seconds=settings.PASSWORD_RESET_CODE_TTL)
+        stale = PasswordReset.objects.filter(Q(used=True) | Q(created_at__lt=cutoff)).order_by('id')
+        total = 0
+        while True:
+            ids = list(stale.values_list('id', flat=True)[:options['chunk_size']])
+            if not ids:
+                break
+            PasswordReset.objects.filter(id__in=ids).delete()
+            total += len(ids)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'purged {total} password resets'))
@@ -15,11 +15,27 @@ class PasswordReset(models.Model):
     """Simple password reset token for dev/testing flows.
 
     In production you'd use a secure time-limited token and send it by email.
+    Only an HMAC of the code is stored (see users.codes.hash_code); codes
+    expire after PASSWORD_RESET_CODE_TTL and `manage.py purge_password_resets`
+    deletes used and expired rows.
     """
     user = models.ForeignKey('users.User', on_delete=models.CASCADE)
-    code = models.CharField(max_length=32)
+    code_hash = models.CharField(max_length=64)
     created_at = models.DateTimeField(auto_now_add=True)
     used = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # ConfirmResetView's lookup, newest first. Partial on used=False rather
+            # than a `used` column: Django renders that filter as `NOT used`, which
+            # SQLite only matches against an identical index condition.
+            models.Index(
+                fields=['user', 'code_hash', '-created_at'], condition=models.Q(used=False),
+                name='passwordreset_lookup_idx',
+            ),
+            # the purge's range scan
+            models.Index(fields=['created_at'], name='passwordreset_created_idx'),
+        ]
+
     def __str__(self):
-        return f"PasswordReset(user={self.user_id}, code={self.code}, used={self.used})"
+        return f"PasswordReset(user={self.user_id}, used={self.used})"
@@ -1,4 +1,9 @@
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+
+from access_control.roles import ROLES_CLAIM, VERSION_CLAIM, load_roles, role_version
+
+from .tokens import FilteredRefreshToken
 
 
 class LoginSerializer(serializers.Serializer):
@@ -28,3 +33,25 @@ class ConfirmResetSerializer(serializers.Serializer):
     email = serializers.EmailField()
     code = serializers.CharField()
     new_password = serializers.CharField(write_only=True)
+
+
+class RoleClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Issue tokens carrying the user's role names and their role version.
+
+    `access_control.roles.user_roles` trusts these claims while the version
+    still matches, so role checks on later requests skip the database.
+    """
+    token_class = FilteredRefreshToken
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # read the version first: a change racing with issue leaves the token stale, not wrong
+        token[VERSION_CLAIM] = role_version(user.pk)
+        token[ROLES_CLAIM] = sorted(load_roles(user))
+        return token
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refresh serializer whose blacklist check goes through the bloom filter."""
+    token_class = FilteredRefreshToken
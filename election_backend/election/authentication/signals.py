@@ -0,0 +1,28 @@
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+
+from users.models import SlimUser, User
+
+from .blacklist import blacklist_changed
+from .cache import bump_user_version
+
+
+@receiver(post_save, sender=BlacklistedToken)
+def token_blacklisted(sender, instance, created, **kwargs):
+    if created:
+        # a process syncing before the commit would not see the row yet
+        transaction.on_commit(blacklist_changed)
+
+
+# signals are sent with the instance's class, so the proxy needs its own receivers
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=SlimUser)
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=SlimUser)
+def user_changed(sender, instance, **kwargs):
+    # after commit, or a request in between could cache the old row under the new version
+    transaction.on_commit(partial(bump_user_version, instance.pk))
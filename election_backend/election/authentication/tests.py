@@ -1,3 +1,208 @@
-from django.test import TestCase
+import io
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+
+from access_control.models import Role, RoleAssignment
+from users import codes
+from users.models import User
+
+from . import blacklist, hashers, lockout
+from .models import PasswordReset
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(
+    CACHES=LOCMEM,
+    AUTH_RATE_LIMITS={},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    LOGIN_LOCKOUT_THRESHOLD=3,
+)
+@mock.patch.object(lockout._writer, 'submit')
+class LoginLockoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        User.objects.create_user('victim', 'victim@example.com', 'right', nid='1', phone='1')
+        self.client = APIClient()
+
+    def login(self, **data):
+        return self.client.post('/api/auth/login/', data)
+
+    def test_rotating_email_does_not_spread_guesses(self, submit):
+        for i in range(3):
+            response = self.login(username='victim', password='wrong', email=f'x{i}@example.com')
+            self.assertEqual(response.status_code, 401)
+        response = self.login(username='victim', password='right', email='fresh@example.com')
+        self.assertEqual(response.status_code, 429)
+
+    def test_success_clears_identifier_counter(self, submit):
+        self.login(username='victim', password='wrong')
+        self.login(username='victim', password='wrong')
+        self.assertEqual(self.login(username='victim', password='right').status_code, 200)
+        self.assertEqual(lockout.failure_counts('victim', None)[lockout.IDENTIFIER], 0)
+
+    def test_status_by_email_reads_username_counter(self, submit):
+        for _ in range(3):
+            self.login(username='victim', password='wrong')
+        response = self.client.post('/api/auth/lockout-status/', {'email': 'VICTIM@example.com'})
+        self.assertTrue(response.data['locked'])
+
+
+class ClientIPTests(TestCase):
+    def request(self, xff):
+        return RequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=xff)
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 0})
+    def test_forwarded_for_ignored_without_proxies(self):
+        self.assertEqual(lockout.client_ip(self.request('1.2.3.4')), '10.0.0.1')
+
+    @override_settings(REST_FRAMEWORK={'NUM_PROXIES': 1})
+    def test_only_trusted_proxy_entry_used(self):
+        self.assertEqual(lockout.client_ip(self.request('6.6.6.6, 1.2.3.4')), '1.2.3.4')
+
+
+@override_settings(
+    CACHES=LOCMEM,
+    AUTH_RATE_LIMITS={},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+    VERIFICATION_CODE_MAX_ATTEMPTS=3,
+)
+class PasswordResetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u', 'u@example.com', 'old', nid='1', phone='1')
+        self.client = APIClient()
+
+    def request_code(self):
+        return self.client.post('/api/auth/reset-password/', {'email': 'u@example.com'}).data['reset_code']
+
+    def confirm(self, code, password='new-password'):
+        return self.client.post('/api/auth/confirm-reset/', {'email': 'u@example.com', 'code': code, 'new_password': password})
+
+    def test_new_code_retires_earlier_ones(self):
+        first = self.request_code()
+        second = self.request_code()
+        if first != second:
+            self.assertEqual(self.confirm(first).status_code, 400)
+        self.assertEqual(self.confirm(second).status_code, 200)
+
+    def test_successful_reset_retires_outstanding_codes(self):
+        code = self.request_code()
+        other = codes.generate_code()
+        PasswordReset.objects.create(user=self.user, code_hash=codes.hash_code(other, codes.PASSWORD_RESET))
+        self.assertEqual(self.confirm(code).status_code, 200)
+        self.assertFalse(PasswordReset.objects.filter(user=self.user, used=False).exists())
+        self.assertEqual(self.confirm(code, 'again').status_code, 400)
+
+    def test_attempts_limited_per_address(self):
+        code = self.request_code()
+        wrong = '000000' if code != '000000' else '111111'
+        for _ in range(3):
+            self.assertEqual(self.confirm(wrong).status_code, 400)
+        # a fresh code does not buy more guesses
+        code = self.request_code()
+        self.assertEqual(self.confirm(code).status_code, 429)
+        self.assertTrue(User.objects.get(pk=self.user.pk).check_password('old'))
+
+
+@override_settings(
+    CACHES=LOCMEM,
+    AUTH_RATE_LIMITS={'lockout_status': {'ip': '2/min', 'username': '100/min'}},
+    REST_FRAMEWORK={'NUM_PROXIES': 0},
+)
+class TokenBucketThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def status_code(self, data=None, **extra):
+        data = {'username': 'someone'} if data is None else data
+        return self.client.post('/api/auth/lockout-status/', data, **extra).status_code
+
+    def test_forwarded_for_does_not_open_fresh_buckets(self):
+        codes_seen = [self.status_code(HTTP_X_FORWARDED_FOR=f'10.0.0.{i}') for i in range(3)]
+        self.assertEqual(codes_seen, [200, 200, 429])
+
+    def test_stats_open_to_admin_role(self):
+        user = User.objects.create_user('u', nid='1', phone='1')
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/auth/rate-limits/').status_code, 403)
+        with self.captureOnCommitCallbacks(execute=True):
+            RoleAssignment.objects.create(user=user, role=Role.objects.create(name='Admin', description=''))
+        response = self.client.get('/api/auth/rate-limits/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('lockout_status', response.data['decisions'])
+
+    def test_request_without_any_key_is_allowed(self):
+        self.assertEqual(self.status_code({}, REMOTE_ADDR=''), 200)
+
+
+@override_settings(CACHES=LOCMEM, JWT_BLACKLIST_COMMIT_MARGIN=5)
+class BlacklistFilterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u', nid='1', phone='1')
+        blacklist.blacklist_filter.__init__()
+
+    def outstanding(self, jti):
+        return OutstandingToken.objects.create(user=self.user, jti=jti, token=jti, expires_at=timezone.now())
+
+    def blacklist(self, jti, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            BlacklistedToken.objects.create(token=self.outstanding(jti), **kwargs)
+
+    def test_row_committing_after_a_higher_id_is_not_missed(self):
+        self.blacklist('first', id=1)
+        self.blacklist('third', id=3)
+        self.assertTrue(blacklist.might_be_blacklisted('third'))
+        # the transaction that took id 2 commits last
+        self.blacklist('second', id=2)
+        self.assertTrue(blacklist.might_be_blacklisted('second'))
+
+    def test_every_revocation_writes_a_new_stamp(self):
+        self.blacklist('first')
+        self.assertTrue(blacklist.might_be_blacklisted('first'))
+        seen = blacklist.blacklist_filter._counter
+        # a lost incr would write back the value this process already saw
+        with mock.patch.object(blacklist.cache, 'incr', return_value=seen):
+            self.blacklist('second')
+        self.assertNotEqual(cache.get(blacklist.COUNTER_KEY), seen)
+        self.assertTrue(blacklist.might_be_blacklisted('second'))
+
+    def test_settled_rows_are_not_rescanned(self):
+        self.blacklist('old', id=1)
+        BlacklistedToken.objects.filter(id=1).update(blacklisted_at=timezone.now() - timedelta(minutes=1))
+        self.blacklist('new', id=2)
+        self.assertTrue(blacklist.might_be_blacklisted('new'))
+        self.assertEqual(blacklist.blacklist_filter._floor, 1)
+        self.assertEqual(blacklist.blacklist_filter._bloom.count, 2)
+        self.assertFalse(blacklist.might_be_blacklisted('never'))
+
+
+@override_settings(CACHES=LOCMEM, PASSWORD_HASHERS=['authentication.hashers.BoundedPBKDF2PasswordHasher'])
+class HashingBusyTests(TestCase):
+    def test_admin_login_gets_503_when_pool_is_full(self):
+        User.objects.create_user('admin', password='pw', nid='1', phone='1', is_staff=True)
+        with mock.patch.object(hashers._HashPool, 'run', side_effect=hashers.HashingBusy):
+            response = self.client.post('/admin/login/', {'username': 'admin', 'password': 'pw'})
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(CACHES=LOCMEM)
+class BenchLoginTests(TransactionTestCase):
+    def test_bench_runs_without_rate_limits(self):
+        # more logins per user than the username bucket allows
+        out = io.StringIO()
+        call_command('bench_login', hashers=['django.contrib.auth.hashers.MD5PasswordHasher'],
+                     requests=30, users=2, concurrency=1, stdout=out)
+        row = out.getvalue().splitlines()[1].split()
+        self.assertEqual(row[-2:], ['0', '0'])
+        self.assertFalse(User.objects.filter(username__startswith='bench-login-').exists())
@@ -0,0 +1,120 @@
+"""Token-bucket rate limits for the anonymous auth endpoints.
+
+Views opt in with ``throttle_classes = (TokenBucketThrottle,)`` and a
+``throttle_scope``; ``settings.AUTH_RATE_LIMITS[scope]`` maps key kinds to
+rates, e.g. ``{'ip': '30/min', 'email': '5/min'}``. A rate ``N/period`` is a
+bucket of N tokens refilled at N per period. Every kind present in the
+request must have a token, so a request is limited by its IP and by the
+account it names.
+
+Buckets live in the Django cache as ``(tokens, updated_at)``. The read and
+write are not atomic across processes, so concurrent requests can overdraw a
+bucket slightly; that is acceptable for abuse control.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import BaseThrottle
+
+from .lockout import client_ip
+
+BUCKET_KEY = 'auth:ratelimit:%s:%s:%s'
+COUNTER_KEY = 'auth:ratelimit:stats:%s:%s:%s'
+
+ALLOWED = 'allowed'
+THROTTLED = 'throttled'
+
+_PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'10/min'`` -> ``(10, 10 / 60)``: bucket capacity and tokens per second."""
+    count, period = rate.split('/')
+    count = int(count)
+    return count, count / _PERIODS[period.strip()[0]]
+
+
+def _field_value(request, kind):
+    # the submitted username/email/phone, normalized the way lockout does it
+    value = request.data.get(kind) if hasattr(request.data, 'get') else None
+    if not isinstance(value, str):
+        return ''
+    value = value.strip()
+    return value.lower() if kind == 'email' else value
+
+
+def _count(scope, kind, outcome):
+    key = COUNTER_KEY % (scope, kind, outcome)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, 1, None)
+
+
+def counters(scopes=None):
+    """Return ``{scope: {kind: {'allowed': n, 'throttled': n}}}`` for the configured limits."""
+    limits = settings.AUTH_RATE_LIMITS
+    keys = [
+        COUNTER_KEY % (scope, kind, outcome)
+        for scope in (scopes or limits) for kind in limits.get(scope, {}) for outcome in (ALLOWED, THROTTLED)
+    ]
+    values = cache.get_many(keys)
+    result = {}
+    for scope in (scopes or limits):
+        for kind in limits.get(scope, {}):
+            result.setdefault(scope, {})[kind] = {
+                outcome: values.get(COUNTER_KEY % (scope, kind, outcome), 0) for outcome in (ALLOWED, THROTTLED)
+            }
+    return result
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Rejects with 429 before the view runs when any of the request's buckets is empty."""
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        limits = settings.AUTH_RATE_LIMITS.get(scope)
+        if not limits:
+            return True
+
+        buckets = []
+        for kind, rate in limits.items():
+            # the same client address the login lockout counts (REMOTE_ADDR unless NUM_PROXIES is set)
+            value = client_ip(request) if kind == 'ip' else _field_value(request, kind)
+            if not value:
+                continue
+            digest = hashlib.sha1(value.encode()).hexdigest()
+            buckets.append((kind, BUCKET_KEY % (scope, kind, digest), parse_rate(rate)))
+
+        self.wait_seconds = 0
+        if not buckets:
+            # no address and none of the limited fields were sent
+            return True
+
+        now = time.time()
+        stored = cache.get_many([key for _, key, _ in buckets])
+        refilled = []
+        for kind, key, (capacity, per_second) in buckets:
+            tokens, updated_at = stored.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * per_second)
+            if tokens < 1:
+                self.wait_seconds = max(self.wait_seconds, (1 - tokens) / per_second)
+                _count(scope, kind, THROTTLED)
+            refilled.append((kind, key, tokens))
+
+        if self.wait_seconds:
+            # a rejected request spends nothing, and an empty bucket refills on its own
+            return False
+
+        # an untouched bucket is full again after capacity / per_second seconds
+        timeout = max((int(capacity / per_second) for _, _, (capacity, per_second) in buckets), default=0) + 1
+        cache.set_many({key: (tokens - 1, now) for _, key, tokens in refilled}, timeout)
+        for kind, _, _ in refilled:
+            _count(scope, kind, ALLOWED)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -0,0 +1,12 @@
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import might_be_blacklisted
+
+
+class FilteredRefreshToken(RefreshToken):
+    """RefreshToken that asks the blacklist bloom filter before querying the blacklist."""
+
+    def check_blacklist(self):
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
@@ -1,7 +1,8 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.exceptions import AuthenticationFailed
 from django.shortcuts import get_object_or_404
 
 from drf_yasg.utils import swagger_auto_schema
@@ -13,47 +14,53 @@ from .serializers import (
 	ResetPasswordSerializer,
 	ConfirmResetSerializer,
 )
-from .models import FailedLoginAttempt, PasswordReset, PasswordChangeLog
+from .models import PasswordReset, PasswordChangeLog
+from . import lockout
+from .throttling import TokenBucketThrottle, counters as rate_limit_counters
+from access_control.roles import is_admin
 from users.models import User
-import random
+from users import codes
+from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from datetime import timedelta
 
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from django.utils.module_loading import import_string
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
 from rest_framework_simplejwt.views import TokenRefreshView
-from rest_framework_simplejwt.tokens import RefreshToken
-
-
-def _client_ip(request):
-	xff = request.META.get('HTTP_X_FORWARDED_FOR')
-	if xff:
-		return xff.split(',')[0].strip()
-	return request.META.get('REMOTE_ADDR')
+from .tokens import FilteredRefreshToken
 
 
 class LoginView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'login'
 
 	@swagger_auto_schema(request_body=LoginSerializer)
 	def post(self, request):
-		# Accept either username+password or email+password
+		# the token serializer authenticates on username only, so that is what the lockout counts
 		data = request.data.copy()
-		serializer = TokenObtainPairSerializer(data=data)
-		if serializer.is_valid():
-			# successful auth
-			return Response(serializer.validated_data)
-
-		# authentication failed — record a failed login attempt if user exists
-		username = data.get('username') or None
-		email = data.get('email') or None
-		user = None
-		if email:
-			user = User.objects.filter(email=email).first()
-		elif username:
-			user = User.objects.filter(username=username).first()
-
-		if user:
-			FailedLoginAttempt.objects.create(user=user, ip_address=_client_ip(request))
+		identifier = lockout.normalize_identifier(data.get('username'))
+		ip = lockout.client_ip(request)
+
+		# enforce the lockout before any user lookup or password hash
+		retry_after = lockout.locked_for(identifier, ip)
+		if retry_after:
+			response = Response({'detail': 'too many failed login attempts', 'retry_after': retry_after}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+			response['Retry-After'] = str(retry_after)
+			return response
+
+		# SIMPLE_JWT['TOKEN_OBTAIN_SERIALIZER'] decides whether role claims are embedded
+		serializer = import_string(jwt_settings.TOKEN_OBTAIN_SERIALIZER)(data=data)
+		try:
+			if serializer.is_valid():
+				# successful auth
+				lockout.clear_failures(identifier)
+				return Response(serializer.validated_data)
+		except AuthenticationFailed:
+			# wrong credentials — count it; the FailedLoginAttempt row is written in the background
+			lockout.record_failure(identifier, ip)
+			raise
 
 		return Response(serializer.errors, status=status.HTTP_401_UNAUTHORIZED)
 
@@ -76,7 +83,7 @@ class LogoutView(APIView):
 
 		refresh = serializer.validated_data['refresh']
 		try:
-			token = RefreshToken(refresh)
+			token = FilteredRefreshToken(refresh)
 			token.blacklist()
 		except Exception:
 			return Response({'detail': 'invalid token'}, status=status.HTTP_400_BAD_REQUEST)
@@ -86,6 +93,8 @@ class LogoutView(APIView):
 
 class LockoutStatusView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'lockout_status'
 
 	@swagger_auto_schema(request_body=LockoutStatusSerializer)
 	def post(self, request):
@@ -95,24 +104,34 @@ class LockoutStatusView(APIView):
 
 		username = serializer.validated_data.get('username')
 		email = serializer.validated_data.get('email')
-		user = None
-		if email:
-			user = User.objects.filter(email=email).first()
-		elif username:
-			user = User.objects.filter(username=username).first()
-
-		if not user:
+		if not username and email:
+			# the counters are keyed on username; an email only finds its account's counter
+			username = User.objects.filter(email__iexact=email).values_list('username', flat=True).first()
+		identifier = lockout.normalize_identifier(username)
+		if not identifier:
 			return Response({'locked': False})
 
-		# simple policy: if >=5 failed attempts in last 15 minutes, account is locked
-		window = timezone.now() - timedelta(minutes=15)
-		attempts = FailedLoginAttempt.objects.filter(user=user, timestamp__gte=window).count()
-		locked = attempts >= 5
+		# read from the same counters LoginView enforces, for this identifier from this client
+		ip = lockout.client_ip(request)
+		attempts = int(lockout.failure_counts(identifier, ip)[lockout.IDENTIFIER])
+		locked = bool(lockout.locked_for(identifier, ip))
 		return Response({'locked': locked, 'failed_attempts_last_15m': attempts})
 
 
+class RateLimitStatsView(APIView):
+	permission_classes = (IsAuthenticated,)
+
+	def get(self, request):
+		if not is_admin(request):
+			return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
+		# allowed/throttled decisions per scope and key kind since the cache was last cleared
+		return Response({'limits': settings.AUTH_RATE_LIMITS, 'decisions': rate_limit_counters()})
+
+
 class ResetPasswordView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'reset_password'
 
 	@swagger_auto_schema(request_body=ResetPasswordSerializer)
 	def post(self, request):
@@ -126,8 +145,11 @@ class ResetPasswordView(APIView):
 			# don't reveal whether user exists
 			return Response({'detail': 'If the email exists a reset code has been sent.'})
 
-		code = f"{random.randint(0, 999999):06d}"
-		PasswordReset.objects.create(user=user, code=code)
+		code = codes.generate_code()
+		with transaction.atomic():
+			# only the newest code is valid; earlier ones would multiply a guesser's odds
+			PasswordReset.objects.filter(user=user, used=False).update(used=True)
+			PasswordReset.objects.create(user=user, code_hash=codes.hash_code(code, codes.PASSWORD_RESET))
 
 		# Development convenience: return the code in response. In prod send via email.
 		return Response({'detail': 'reset code generated', 'reset_code': code})
@@ -135,6 +157,8 @@ class ResetPasswordView(APIView):
 
 class ConfirmResetView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'confirm_reset'
 
 	@swagger_auto_schema(request_body=ConfirmResetSerializer)
 	def post(self, request):
@@ -146,20 +170,30 @@ class ConfirmResetView(APIView):
 		code = serializer.validated_data['code']
 		new_password = serializer.validated_data['new_password']
 
+		# VERIFICATION_CODE_MAX_ATTEMPTS per address per PASSWORD_RESET_CODE_TTL, across all its codes;
+		# requesting a new code does not reset the count, a successful reset does
+		if not codes.take_attempt(codes.PASSWORD_RESET, email, settings.PASSWORD_RESET_CODE_TTL):
+			return Response({'detail': 'too many attempts'}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+
 		user = User.objects.filter(email=email).first()
 		if not user:
 			return Response({'detail': 'invalid code or email'}, status=status.HTTP_400_BAD_REQUEST)
 
-		# find latest matching unused code within 24 hours
-		window = timezone.now() - timedelta(hours=24)
-		pr = PasswordReset.objects.filter(user=user, code=code, used=False, created_at__gte=window).order_by('-created_at').first()
-		if not pr:
+		# find latest matching unused code within PASSWORD_RESET_CODE_TTL (passwordreset_lookup_idx)
+		window = timezone.now() - timedelta(seconds=settings.PASSWORD_RESET_CODE_TTL)
+		pr = PasswordReset.objects.filter(
+			user=user, code_hash=codes.hash_code(code, codes.PASSWORD_RESET), used=False, created_at__gte=window,
+		).order_by('-created_at').values_list('pk', flat=True).first()
+		# claiming the row with a conditional UPDATE lets a code be used only once, even concurrently
+		if not pr or not PasswordReset.objects.filter(pk=pr, used=False).update(used=True):
 			return Response({'detail': 'invalid or expired code'}, status=status.HTTP_400_BAD_REQUEST)
 
+		# and retire any other code still outstanding for the account
+		PasswordReset.objects.filter(user=user, used=False).update(used=True)
+		codes.clear_attempts(codes.PASSWORD_RESET, email)
+
 		user.set_password(new_password)
 		user.save()
-		pr.used = True
-		pr.save()
 
 		# log password change
 		PasswordChangeLog.objects.create(user=user)
@@ -1,38 +1,34 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.utils import timezone
 from django.shortcuts import get_object_or_404
 
-from access_control.models import Role, RoleChangeRequest, RoleAssignment
+from access_control.models import Role, RoleChangeRequest
+from access_control.labels import filter_by_clearance
+from access_control.roles import is_admin
 from access_control.serializers import RoleSerializer, RoleChangeRequestSerializer
 from audit_logs.models import UserActivityLog, SystemEventLog
 from backups.views import BACKUP_DIR
 from backups.models import BackupHistory
-from elections.models import Election
+from elections.cache import active_elections
 from users.models import User
 
 
-def _is_admin(user):
-	return user.is_authenticated and (user.is_staff or user.is_superuser or RoleAssignment.objects.filter(user=user, role__name__iexact='Admin').exists())
-
-
 class DashboardOverviewView(APIView):
 	permission_classes = (IsAuthenticated,)
 
 	def get(self, request):
-		now = timezone.now()
 		users_count = User.objects.count()
 		roles_count = Role.objects.count()
 		pending_requests = RoleChangeRequest.objects.filter(status=RoleChangeRequest.REQUESTED).count()
-		active_elections = Election.objects.filter(start_time__lte=now, end_time__gte=now).count()
-		recent_events = SystemEventLog.objects.order_by('-timestamp')[:5]
+		active_count = len(active_elections())
+		recent_events = filter_by_clearance(SystemEventLog.objects.order_by('-timestamp'), request.user)[:5]
 		events = [{'event_type': e.event_type, 'description': e.description, 'timestamp': e.timestamp} for e in recent_events]
 		return Response({
 			'users_count': users_count,
 			'roles_count': roles_count,
 			'pending_role_change_requests': pending_requests,
-			'active_elections': active_elections,
+			'active_elections': active_count,
 			'recent_system_events': events,
 		})
 
@@ -53,10 +49,10 @@ class DashboardLogsView(APIView):
 
 	def get(self, request):
 		# filterable by query params: user, start, end, limit
-		if not _is_admin(request.user):
+		if not is_admin(request):
 			return Response({'detail': 'admin privileges required'}, status=403)
 
-		qs = UserActivityLog.objects.order_by('-timestamp')
+		qs = filter_by_clearance(UserActivityLog.objects.order_by('-timestamp'), request.user)
 		user = request.query_params.get('user')
 		action = request.query_params.get('action')
 		start = request.query_params.get('start')
@@ -80,7 +76,7 @@ class DashboardBackupsView(APIView):
 	permission_classes = (IsAuthenticated,)
 
 	def get(self, request):
-		if not _is_admin(request.user):
+		if not is_admin(request):
 			return Response({'detail': 'admin privileges required'}, status=403)
 		# list files and history
 		files = []
@@ -97,7 +93,7 @@ class DashboardAlertsView(APIView):
 
 	def get(self, request):
 		# recent system events as alerts
-		events = SystemEventLog.objects.order_by('-timestamp')[:50]
+		events = filter_by_clearance(SystemEventLog.objects.order_by('-timestamp'), request.user)[:50]
 		out = [{'event_type': e.event_type, 'description': e.description, 'timestamp': e.timestamp} for e in events]
 		return Response({'alerts': out})
 
@@ -109,7 +105,7 @@ class DashboardAccessDeniedView(APIView):
 		# returns last access denied reason for a user or general reason
 		user = request.query_params.get('user')
 		# try to find a recent user activity log with action containing 'denied' or 'access_denied'
-		qs = UserActivityLog.objects.filter(action__icontains='denied')
+		qs = filter_by_clearance(UserActivityLog.objects.filter(action__icontains='denied'), request.user)
 		if user:
 			qs = qs.filter(user_id=user)
 		last = qs.order_by('-timestamp').first()
@@ -117,8 +113,6 @@ class DashboardAccessDeniedView(APIView):
 			return Response({'reason': f"{last.action} on {last.resource} at {last.timestamp}"})
 
 		# fallback: if no active election, voting attempts would be denied due to time
-		now = timezone.now()
-		active = Election.objects.filter(start_time__lte=now, end_time__gte=now).exists()
-		if not active:
+		if not active_elections():
 			return Response({'reason': 'RuBAC: Outside voting hours'})
 		return Response({'reason': 'access denied'})
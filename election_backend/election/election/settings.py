@@ -66,6 +66,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'authentication.hashers.HashingBusyMiddleware',
 ]
 
 ROOT_URLCONF = 'election.urls'
@@ -99,6 +100,34 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Shared by every worker on the host, so it can carry cross-process version
+# stamps and counters. Point it at Redis or Memcached when running on several nodes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
+    }
+}
+
+
+# Same formats as Django's defaults; PBKDF2-SHA256 runs on a bounded pool
+# (authentication.hashers), so hashing load cannot starve the workers.
+PASSWORD_HASHERS = [
+    'authentication.hashers.BoundedPBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# Threads hashing passwords (None: one per CPU), requests allowed to wait for
+# one, and seconds a request waits before getting 503.
+PASSWORD_HASH_WORKERS = None
+PASSWORD_HASH_QUEUE = 64
+PASSWORD_HASH_WAIT = 2.0
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -150,11 +179,16 @@ AUTH_USER_MODEL = 'users.User'
 # Django REST Framework and Simple JWT configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication with a cached slim user record
+        'authentication.backends.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # X-Forwarded-For entries added by trusted proxies in front of the app. The
+    # login lockout and rate limits key on the client IP derived from this; 0
+    # means REMOTE_ADDR, so clients cannot pick their IP with a header.
+    'NUM_PROXIES': 0,
 }
 
 SIMPLE_JWT = {
@@ -165,6 +199,11 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    # embeds role names + role version in tokens; point back at
+    # rest_framework_simplejwt.serializers.TokenObtainPairSerializer to turn off
+    'TOKEN_OBTAIN_SERIALIZER': 'authentication.serializers.RoleClaimsTokenObtainPairSerializer',
+    # checks the blacklist bloom filter (authentication.blacklist) before the table
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.serializers.FilteredTokenRefreshSerializer',
 }
 
 # drf-yasg / Swagger settings
@@ -179,3 +218,91 @@ SWAGGER_SETTINGS = {
         }
     },
 }
+
+# Vote ingestion: 'direct' commits each vote in the request; 'queued' stores it
+# in QueuedVote and returns a receipt, and `manage.py drain_vote_queue` commits
+# the queue to Vote in batches.
+VOTE_INGESTION_MODE = 'direct'
+VOTE_QUEUE_BATCH_SIZE = 500
+
+# Seconds between result updates pushed on /api/elections/<id>/results/stream/.
+# Changes within a tick are coalesced into a single event.
+RESULTS_STREAM_TICK = 1.0
+
+# Seconds after an election's end_time during which offline kiosk uploads are
+# still accepted. `manage.py finalize_elections` (run it from cron) only
+# freezes results once this has passed; until then results are read live.
+ELECTION_FINALIZE_GRACE = 24 * 60 * 60
+
+# Delta sync feed (/api/elections/sync/): at most about this many rows per
+# page; versions newer than SYNC_INFLIGHT_MARGIN seconds are held back until
+# every write that allocated an earlier version has committed; change rows and
+# tombstones older than SYNC_CHANGE_RETENTION seconds are deleted by
+# `manage.py prune_sync_changes` (run it from cron).
+SYNC_PAGE_SIZE = 1000
+SYNC_INFLIGHT_MARGIN = 5
+SYNC_CHANGE_RETENTION = 30 * 24 * 60 * 60
+
+# Largest batch accepted from a polling-station device on /api/elections/votes/upload/.
+DEVICE_UPLOAD_MAX_RECORDS = 5000
+
+# Largest list accepted by the bulk assign-role / approve-role-change endpoints.
+ACCESS_BULK_MAX_ITEMS = 5000
+
+# Cache alias holding authorization state shared by all workers: role/policy/
+# permission/label version stamps and cached decisions. Must be a cache every
+# node can reach in production (the file cache above only spans one host).
+AUTHZ_CACHE = 'default'
+# Seconds a cached authorization decision lives; version bumps end it sooner.
+AUTHZ_CACHE_TIMEOUT = 300
+
+# Login lockout (authentication.lockout): failures are counted in the cache over
+# a sliding window, per login identifier and per client IP. The IP limit is
+# higher because many voters can share one address.
+LOGIN_LOCKOUT_WINDOW = 15 * 60
+LOGIN_LOCKOUT_THRESHOLD = 5
+LOGIN_LOCKOUT_IP_THRESHOLD = 50
+# FailedLoginAttempt rows are written in batches of up to this many, at most
+# this many seconds after the failure.
+LOGIN_FAILURE_BATCH_SIZE = 200
+LOGIN_FAILURE_FLUSH_INTERVAL = 1.0
+
+# Per-process bloom filter of blacklisted refresh-token JTIs. Sized for this
+# many entries at this false-positive rate (about 1.8 MB); it is rebuilt larger
+# if the blacklist outgrows it. `manage.py prune_tokens` keeps the table small.
+JWT_BLACKLIST_BLOOM_CAPACITY = 1000000
+JWT_BLACKLIST_BLOOM_ERROR_RATE = 0.001
+# Longest a transaction inserting a BlacklistedToken may stay open. Rows newer
+# than this are rescanned on each sync so one that commits late is still seen.
+JWT_BLACKLIST_COMMIT_MARGIN = 5
+
+# Seconds the slim user record behind CachedJWTAuthentication is cached. Saves
+# invalidate it at once; this bounds staleness after queryset update() calls.
+AUTH_USER_CACHE_TIMEOUT = 60
+
+# Token-bucket limits on the anonymous auth endpoints (authentication.throttling),
+# per view scope and per key: the client IP and the username/email/phone sent.
+# 'N/min' is a bucket of N requests refilled at N per minute; over-limit
+# requests get 429 before any database or hashing work.
+AUTH_RATE_LIMITS = {
+    'login': {'ip': '60/min', 'username': '10/min', 'email': '10/min'},
+    'lockout_status': {'ip': '60/min', 'username': '20/min', 'email': '20/min'},
+    'reset_password': {'ip': '20/min', 'email': '5/min'},
+    'confirm_reset': {'ip': '20/min', 'email': '5/min'},
+    'verify_email': {'ip': '30/min', 'email': '10/min'},
+    'verify_phone': {'ip': '30/min', 'phone': '10/min'},
+    'resend_code': {'ip': '10/min', 'email': '3/min', 'phone': '3/min'},
+}
+
+# Email/phone verification codes (users.codes) are kept hashed in the cache and
+# expire after this many seconds or this many wrong guesses. A pending MFA
+# enrollment secret is kept for MFA_ENROLLMENT_TTL seconds.
+VERIFICATION_CODE_TTL = 24 * 60 * 60
+VERIFICATION_CODE_MAX_ATTEMPTS = 5
+MFA_ENROLLMENT_TTL = 15 * 60
+
+# Password reset codes are valid this many seconds. `manage.py
+# purge_password_resets` (run it from cron, e.g. hourly) deletes used and
+# expired ones this many rows at a time.
+PASSWORD_RESET_CODE_TTL = 24 * 60 * 60
+PASSWORD_RESET_PURGE_CHUNK_SIZE = 1000
@@ -1,3 +1,8 @@
 from django.contrib import admin
+from .models import PollingStationDevice
 
-# Register your models here.
+
+@admin.register(PollingStationDevice)
+class PollingStationDeviceAdmin(admin.ModelAdmin):
+	list_display = ('id', 'name', 'is_active', 'created_at')
+	search_fields = ('name',)
@@ -0,0 +1,59 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import Election
+
+VERSION_KEY = 'elections:active:version'
+
+_lock = threading.Lock()
+# (version, expires_at, {election_id: Election}) for this process
+_state = (None, None, {})
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, time.time_ns(), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def active_elections():
+    """Return ``{id: Election}`` for elections whose voting window contains now.
+
+    The set is cached per process until the next start or end boundary, or
+    until another process bumps the shared version via `invalidate_active_elections`.
+    """
+    global _state
+    now = timezone.now()
+    version = _version()
+    cached_version, expires_at, elections = _state
+    if cached_version == version and (expires_at is None or now < expires_at):
+        return elections
+
+    with _lock:
+        active = Election.objects.filter(start_time__lte=now, end_time__gte=now).order_by('id')
+        elections = {e.id: e for e in active}
+        # an election stops being active on the first instant after end_time
+        boundaries = [e.end_time + timedelta(microseconds=1) for e in elections.values()]
+        next_start = Election.objects.filter(start_time__gt=now).aggregate(t=Min('start_time'))['t']
+        if next_start is not None:
+            boundaries.append(next_start)
+        _state = (version, min(boundaries, default=None), elections)
+    return elections
+
+
+def invalidate_active_elections():
+    """Drop the cached active set in every process.
+
+    Saving or deleting an `Election` calls this through a signal; call it
+    directly after ``bulk_create`` or ``QuerySet.update`` on elections.
+    """
+    global _state
+    cache.set(VERSION_KEY, time.time_ns(), None)
+    _state = (None, None, {})
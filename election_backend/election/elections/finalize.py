@@ -0,0 +1,83 @@
+import csv
+import gzip
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Candidate, CandidateResult, ElectionResult, QueuedVote, Vote
+
+
+ARCHIVE_DIR = Path(settings.BASE_DIR) / 'vote_archives'
+
+
+def finalizable_before():
+    """Elections that ended before this instant are past the grace period and can be finalized."""
+    return timezone.now() - timedelta(seconds=settings.ELECTION_FINALIZE_GRACE)
+
+
+def finalize_election(election, archive=False, delete_votes=False):
+    """Freeze the totals of a closed election into `ElectionResult`/`CandidateResult`.
+
+    Only runs once ``ELECTION_FINALIZE_GRACE`` seconds have passed since
+    ``end_time``, so late offline kiosk uploads are not shut out. Returns the
+    result, or None while queued votes for the election are still waiting to
+    be committed. Finalizing twice returns the existing result.
+    With ``archive=True`` the election's votes are copied to a gzipped CSV
+    file once the totals are stored; they are only deleted from the database
+    with ``delete_votes=True`` as well. Deleted votes are gone for good: the
+    results can no longer be recounted or rebuilt from the database, only from
+    the archive file.
+    """
+    if election.end_time >= timezone.now():
+        raise ValueError('election is still open')
+    if election.end_time >= finalizable_before():
+        raise ValueError('election is within its finalize grace period')
+    if QueuedVote.objects.filter(election=election, status=QueuedVote.PENDING).exists():
+        return None
+
+    with transaction.atomic():
+        counts = list(Candidate.objects.filter(election=election).annotate(n=Count('vote')).values_list('id', 'name', 'n'))
+        result, created = ElectionResult.objects.get_or_create(
+            election=election,
+            defaults={'district': election.district, 'total_votes': sum(n for _, _, n in counts)},
+        )
+        if created:
+            CandidateResult.objects.bulk_create([
+                CandidateResult(result=result, candidate_id=cid, candidate_name=name, votes=n)
+                for cid, name, n in counts
+            ])
+
+    # an archive written without deleting is rewritten when the votes are deleted later
+    if archive and (not result.archive_file or delete_votes and Vote.objects.filter(election=election).exists()):
+        result.archive_file = archive_votes(election, delete=delete_votes)
+        result.save(update_fields=['archive_file'])
+    return result
+
+
+def archive_votes(election, delete=False):
+    """Write the election's votes to a gzipped CSV in ARCHIVE_DIR and return the file name.
+
+    With ``delete=True`` the votes are deleted once the file is on disk.
+    """
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+    file_name = f"votes-election-{election.id}-{timezone.now().strftime('%Y%m%d%H%M%S')}.csv.gz"
+    path = ARCHIVE_DIR / file_name
+    votes = Vote.objects.filter(election=election)
+    with transaction.atomic():
+        with open(path, 'wb') as raw:
+            with gzip.open(raw, 'wt', newline='') as f:
+                writer = csv.writer(f)
+                writer.writerow(['id', 'voter_id', 'candidate_id', 'timestamp'])
+                for row in votes.order_by('id').values_list('id', 'voter_id', 'candidate_id', 'timestamp').iterator():
+                    writer.writerow([row[0], row[1], row[2], row[3].isoformat()])
+            # the archive must be on disk before the rows go away
+            raw.flush()
+            os.fsync(raw.fileno())
+        if delete:
+            votes.delete()
+    return file_name
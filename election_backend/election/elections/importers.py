@@ -0,0 +1,153 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from .cache import invalidate_active_elections
+from .models import Candidate, Election
+from .serializers import CandidateImportSerializer, ElectionSerializer
+from .signals import next_version
+
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportFormatError(ValueError):
+    """The file cannot be read past ``line``; ``report`` holds what was imported before it."""
+
+    def __init__(self, message, line):
+        super().__init__(f'line {line}: {message}')
+        self.line = line
+        self.report = None
+
+
+class InvalidRecord:
+    """An NDJSON line that did not parse into an object; reported as that row's error."""
+
+    def __init__(self, message):
+        self.message = message
+
+
+def _decoded_lines(binary_stream):
+    # decoded line by line so an encoding error can name its line
+    for number, raw in enumerate(binary_stream, start=1):
+        try:
+            yield raw.decode('utf-8-sig' if number == 1 else 'utf-8')
+        except UnicodeDecodeError:
+            raise ImportFormatError('not valid UTF-8', number) from None
+
+
+def read_records(binary_stream, fmt):
+    """Yield one dict per CSV row or NDJSON line without loading the whole file.
+
+    A bad NDJSON line yields an `InvalidRecord`; text that is not UTF-8 or CSV
+    that cannot be parsed raises `ImportFormatError`.
+    """
+    lines = _decoded_lines(binary_stream)
+    if fmt == 'csv':
+        # csv's own line_num lags on errors; count the lines handed to it instead
+        consumed = 0
+
+        def counted():
+            nonlocal consumed
+            for line in lines:
+                consumed += 1
+                yield line
+
+        reader = csv.DictReader(counted())
+        while True:
+            try:
+                yield next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                raise ImportFormatError(f'malformed CSV: {e}', consumed) from None
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield InvalidRecord(f'invalid JSON: {e.msg}')
+        else:
+            yield record if isinstance(record, dict) else InvalidRecord('invalid JSON: expected an object')
+
+
+def _validate_elections(chunk):
+    objs, errors = [], []
+    for row_number, record in chunk:
+        serializer = ElectionSerializer(data=record)
+        if serializer.is_valid():
+            objs.append(Election(**serializer.validated_data))
+        else:
+            errors.append({'row': row_number, 'errors': serializer.errors})
+    return objs, errors
+
+
+def _validate_candidates(chunk):
+    valid, errors = [], []
+    for row_number, record in chunk:
+        serializer = CandidateImportSerializer(data=record)
+        if serializer.is_valid():
+            valid.append((row_number, serializer.validated_data))
+        else:
+            errors.append({'row': row_number, 'errors': serializer.errors})
+
+    # one query per chunk for the referenced elections and whether their results are frozen
+    known = dict(Election.objects.filter(pk__in={data['election'] for _, data in valid}).values_list('id', 'final_result'))
+    objs = []
+    for row_number, data in valid:
+        if data['election'] not in known:
+            errors.append({'row': row_number, 'errors': {'election': ['election not found']}})
+        elif known[data['election']] is not None:
+            errors.append({'row': row_number, 'errors': {'election': ['election is finalized']}})
+        else:
+            objs.append(Candidate(election_id=data['election'], name=data['name']))
+    return objs, errors
+
+
+def import_records(kind, records, chunk_size=1000):
+    """Validate and insert election or candidate records chunk by chunk.
+
+    Each chunk is validated without per-row queries and written with one
+    ``bulk_create`` in its own transaction, sharing a single sync version.
+    Returns ``{'created': n, 'error_count': n, 'errors': [...]}``. When the
+    reader raises `ImportFormatError`, the rows before the broken line are
+    still imported and the error carries their report.
+    """
+    model, validate = (Election, _validate_elections) if kind == 'elections' else (Candidate, _validate_candidates)
+    report = {'created': 0, 'error_count': 0, 'errors': []}
+    numbered = enumerate(records, start=1)
+    broken = None
+    while broken is None:
+        chunk = []
+        try:
+            for item in islice(numbered, chunk_size):
+                chunk.append(item)
+        except ImportFormatError as e:
+            broken = e
+        if not chunk:
+            break
+        unreadable = [
+            {'row': n, 'errors': {'non_field_errors': [r.message]}} for n, r in chunk if isinstance(r, InvalidRecord)
+        ]
+        objs, errors = validate([(n, r) for n, r in chunk if not isinstance(r, InvalidRecord)])
+        errors += unreadable
+        with transaction.atomic():
+            # bulk_create skips the pre_save signal, so stamp the chunk's version here
+            version = next_version(model._meta.model_name)
+            for obj in objs:
+                obj.version = version
+            model.objects.bulk_create(objs)
+        report['created'] += len(objs)
+        report['error_count'] += len(errors)
+        room = MAX_REPORTED_ERRORS - len(report['errors'])
+        report['errors'].extend(sorted(errors, key=lambda e: e['row'])[:room])
+
+    if kind == 'elections' and report['created']:
+        invalidate_active_elections()
+    if broken is not None:
+        broken.report = report
+        raise broken
+    return report
@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import QueuedVote, Vote
+from .tallies import record_votes
+
+
+ALREADY_VOTED = 'user has already voted in this election'
+
+
+def drain_vote_queue(batch_size=None):
+    """Commit one batch of pending queued votes; returns the number of queue rows processed.
+
+    The whole batch is checked against existing votes in one query, inserted
+    with a single ``bulk_create`` and committed in one transaction. A direct
+    vote can still land between that check and the insert; the batch is then
+    settled one vote at a time and only the conflicting rows are rejected.
+
+    ``skip_locked`` lets drainers share the queue on PostgreSQL and MySQL. It
+    is ignored on SQLite, which has no row locks: there a second concurrent
+    drainer fails with "database is locked" rather than claiming the same
+    rows, so run a single worker.
+    """
+    batch_size = batch_size or settings.VOTE_QUEUE_BATCH_SIZE
+    with transaction.atomic():
+        pending = list(
+            QueuedVote.objects.select_for_update(skip_locked=True)
+            .filter(status=QueuedVote.PENDING)
+            .order_by('id')[:batch_size]
+        )
+        if not pending:
+            return 0
+
+        voted = set(
+            Vote.objects.filter(
+                election_id__in={q.election_id for q in pending},
+                voter_id__in={q.voter_id for q in pending},
+            ).values_list('voter_id', 'election_id')
+        )
+        accepted = []
+        for q in pending:
+            key = (q.voter_id, q.election_id)
+            if key in voted:
+                q.status = QueuedVote.REJECTED
+                q.detail = ALREADY_VOTED
+                continue
+            voted.add(key)
+            accepted.append(q)
+
+        try:
+            with transaction.atomic():
+                votes = Vote.objects.bulk_create([_vote_for(q) for q in accepted])
+                record_votes(votes)
+        except IntegrityError:
+            # a direct vote won the race for one of these voters
+            accepted, votes = _insert_one_by_one(accepted)
+
+        now = timezone.now()
+        for q, vote in zip(accepted, votes):
+            q.status = QueuedVote.COMMITTED
+            q.vote = vote
+        for q in pending:
+            q.processed_at = now
+        QueuedVote.objects.bulk_update(pending, ['status', 'detail', 'vote', 'processed_at'])
+    return len(pending)
+
+
+def _vote_for(queued):
+    return Vote(voter_id=queued.voter_id, election_id=queued.election_id, candidate_id=queued.candidate_id,
+                timestamp=queued.created_at)
+
+
+def _insert_one_by_one(queued_votes):
+    accepted, votes = [], []
+    for q in queued_votes:
+        vote = _vote_for(q)
+        try:
+            with transaction.atomic():
+                vote.save(force_insert=True)
+                record_votes([vote])
+        except IntegrityError:
+            q.status = QueuedVote.REJECTED
+            q.detail = ALREADY_VOTED
+        else:
+            accepted.append(q)
+            votes.append(vote)
+    return accepted, votes
@@ -0,0 +1,28 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from elections.ingest import drain_vote_queue
+
+
+class Command(BaseCommand):
+    help = ('Commit queued votes to the Vote table in batches. Several workers can share the queue on '
+            'PostgreSQL or MySQL; run a single worker on SQLite, which has no row locks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.VOTE_QUEUE_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep draining instead of exiting when the queue is empty.')
+        parser.add_argument('--interval', type=float, default=0.5, help='Seconds to sleep when the queue is empty (with --loop).')
+
+    def handle(self, *args, **options):
+        total = 0
+        while True:
+            processed = drain_vote_queue(options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        self.stdout.write(self.style.SUCCESS(f'processed {total} queued votes'))
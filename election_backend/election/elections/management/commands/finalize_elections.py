@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.finalize import finalizable_before, finalize_election
+from elections.models import Election
+
+
+class Command(BaseCommand):
+    help = ('Freeze the results of elections that closed more than ELECTION_FINALIZE_GRACE seconds ago. '
+            'Safe to schedule; finalized elections are skipped.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', type=int, action='append', dest='elections',
+                            help='Only finalize this election (repeatable). Defaults to every closed election.')
+        parser.add_argument('--archive', action='store_true',
+                            help='Copy the votes of finalized elections to a gzipped CSV archive.')
+        parser.add_argument('--delete-votes', action='store_true',
+                            help='With --archive, delete the archived votes from the database. Irreversible: '
+                                 'the results can then only be recounted from the archive files.')
+
+    def handle(self, *args, **options):
+        if options['delete_votes'] and not options['archive']:
+            raise CommandError('--delete-votes requires --archive')
+        elections = Election.objects.filter(end_time__lt=finalizable_before())
+        if options['elections']:
+            elections = elections.filter(pk__in=options['elections'])
+        elif not options['archive']:
+            elections = elections.filter(final_result__isnull=True)
+
+        for election in elections:
+            result = finalize_election(election, archive=options['archive'], delete_votes=options['delete_votes'])
+            if result is None:
+                self.stdout.write(self.style.WARNING(f'election {election.id}: queued votes pending, skipped'))
+            else:
+                self.stdout.write(f'election {election.id}: {result.total_votes} votes finalized')
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from elections.importers import ImportFormatError, import_records, read_records
+
+
+class Command(BaseCommand):
+    help = 'Bulk import elections or candidates from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=('elections', 'candidates'))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('csv', 'ndjson'), help='Defaults to the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'ndjson')
+        broken = None
+        with open(path, 'rb') as f:
+            try:
+                report = import_records(options['kind'], read_records(f, fmt), options['chunk_size'])
+            except ImportFormatError as e:
+                broken, report = e, e.report
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        summary = f"created {report['created']} {options['kind']}, {report['error_count']} rows rejected"
+        if broken is not None:
+            raise CommandError(f'{broken}; stopped there after {summary}')
+        self.stdout.write(self.style.SUCCESS(summary))
@@ -0,0 +1,22 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from elections.sync import prune_changes
+
+
+class Command(BaseCommand):
+    help = ('Delete sync change rows and tombstones older than SYNC_CHANGE_RETENTION, in small chunks. '
+            'Devices whose version is older than that get a full snapshot on their next sync.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=float, default=settings.SYNC_CHANGE_RETENTION / 86400,
+                            help='Keep this many days of changes.')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        before = timezone.now() - timedelta(days=options['days'])
+        total = prune_changes(before, options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'pruned {total} sync changes'))
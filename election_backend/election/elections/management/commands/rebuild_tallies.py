@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from elections.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-candidate vote tallies and turnout buckets from the Vote table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--election', type=int, action='append', dest='elections',
+                            help='Only rebuild this election (repeatable). Defaults to all elections.')
+
+    def handle(self, *args, **options):
+        written = rebuild_tallies(options['elections'])
+        self.stdout.write(self.style.SUCCESS(f'rebuilt {written} tally and turnout rows'))
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_candidate_election(apps, schema_editor):
+    Vote = apps.get_model('elections', 'Vote')
+    Candidate = apps.get_model('elections', 'Candidate')
+    Vote.objects.update(
+        election=models.Subquery(Candidate.objects.filter(pk=models.OuterRef('candidate')).values('election')[:1])
+    )
+
+
+def drop_duplicate_votes(apps, schema_editor):
+    """Keep each voter's earliest vote per election so the unique constraint can be added.
+
+    The old check-then-insert let concurrent requests record a second vote.
+    Tallies of the dropped votes' candidates are lowered to match.
+    """
+    Vote = apps.get_model('elections', 'Vote')
+    CandidateTally = apps.get_model('elections', 'CandidateTally')
+    duplicated = (
+        Vote.objects.values('voter_id', 'election_id')
+        .annotate(n=models.Count('id'))
+        .filter(n__gt=1)
+        .values_list('voter_id', 'election_id')
+    )
+    for voter_id, election_id in duplicated:
+        votes = Vote.objects.filter(voter_id=voter_id, election_id=election_id).order_by('timestamp', 'id')
+        dropped = list(votes.values_list('id', 'candidate_id')[1:])
+        for _, candidate_id in dropped:
+            CandidateTally.objects.filter(candidate_id=candidate_id, votes__gt=0).update(votes=models.F('votes') - 1)
+        Vote.objects.filter(id__in=[vote_id for vote_id, _ in dropped]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0003_candidatetally'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='elections.election'),
+        ),
+        migrations.RunPython(copy_candidate_election, migrations.RunPython.noop),
+        migrations.RunPython(drop_duplicate_votes, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='election',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.election'),
+        ),
+        migrations.AddConstraint(
+            model_name='vote',
+            constraint=models.UniqueConstraint(fields=('voter', 'election'), name='unique_vote_per_election'),
+        ),
+    ]
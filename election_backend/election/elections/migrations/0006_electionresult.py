@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0005_queuedvote'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ElectionResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('district', models.CharField(db_index=True, max_length=50)),
+                ('total_votes', models.PositiveIntegerField()),
+                ('finalized_at', models.DateTimeField(auto_now_add=True)),
+                ('archive_file', models.CharField(blank=True, max_length=255)),
+                ('election', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='final_result', to='elections.election')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CandidateResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('candidate_name', models.CharField(max_length=100)),
+                ('votes', models.PositiveIntegerField()),
+                ('candidate', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='elections.candidate')),
+                ('result', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='candidates', to='elections.electionresult')),
+            ],
+        ),
+    ]
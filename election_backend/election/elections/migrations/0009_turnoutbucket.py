@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0008_syncchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TurnoutBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('district', models.CharField(max_length=50)),
+                ('minute', models.DateTimeField()),
+                ('votes', models.PositiveIntegerField(default=0)),
+                ('election', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='elections.election')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['district', 'minute'], name='elections_t_distric_ab113c_idx')],
+                'constraints': [models.UniqueConstraint(fields=('election', 'district', 'minute'), name='unique_turnout_bucket')],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    """Recompute tallies from Vote, as `manage.py rebuild_tallies` does.
+
+    CandidateTally (0003) was added empty, so results read zero for votes cast
+    before it. Elections whose votes were archived at finalization keep their rows.
+    """
+    CandidateTally = apps.get_model('elections', 'CandidateTally')
+    ElectionResult = apps.get_model('elections', 'ElectionResult')
+    Vote = apps.get_model('elections', 'Vote')
+
+    archived = ElectionResult.objects.exclude(archive_file='').values('election_id')
+    votes = Vote.objects.exclude(election_id__in=archived)
+    CandidateTally.objects.exclude(candidate__election_id__in=archived).delete()
+    CandidateTally.objects.bulk_create([
+        CandidateTally(candidate_id=row['candidate_id'], votes=row['n'])
+        for row in votes.values('candidate_id').annotate(n=Count('id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0009_turnoutbucket'),
+    ]
+
+    operations = [
+        # the tally's election duplicated candidate.election and could disagree with it
+        migrations.RemoveIndex(
+            model_name='candidatetally',
+            name='elections_c_electio_287e5c_idx',
+        ),
+        migrations.RemoveField(
+            model_name='candidatetally',
+            name='election',
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncMinute
+
+
+def backfill_turnout(apps, schema_editor):
+    """Recompute turnout buckets from Vote, as `manage.py rebuild_tallies` does.
+
+    TurnoutBucket (0009) was added empty, so turnout read zero for votes cast
+    before it. Elections whose votes were archived at finalization keep their rows.
+    """
+    TurnoutBucket = apps.get_model('elections', 'TurnoutBucket')
+    ElectionResult = apps.get_model('elections', 'ElectionResult')
+    Vote = apps.get_model('elections', 'Vote')
+
+    archived = ElectionResult.objects.exclude(archive_file='').values('election_id')
+    votes = Vote.objects.exclude(election_id__in=archived)
+    TurnoutBucket.objects.exclude(election_id__in=archived).delete()
+    TurnoutBucket.objects.bulk_create([
+        TurnoutBucket(election_id=row['election_id'], district=row['election__district'], minute=row['minute'], votes=row['n'])
+        for row in votes.annotate(minute=TruncMinute('timestamp'))
+        .values('election_id', 'election__district', 'minute').annotate(n=Count('id'))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('elections', '0010_backfill_tallies'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_turnout, migrations.RunPython.noop),
+    ]
@@ -1,18 +1,140 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.utils import timezone
 
 # Create your models here.
-class Election(models.Model):
+class SyncChange(models.Model):
+    """Change log for the delta sync feed; the id is the change version.
+
+    Every save of an `Election` or `Candidate` takes a new row here as its
+    version, and every delete leaves a tombstone row. `prune_sync_changes`
+    drops rows older than ``SYNC_CHANGE_RETENTION``.
+    """
+    model = models.CharField(max_length=20)
+    object_id = models.BigIntegerField(null=True)
+    deleted = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['deleted', 'id'])]
+
+
+class VersionedModel(models.Model):
+    """Saves in a transaction, so the `SyncChange` row that `stamp_version`
+    takes in pre_save commits together with the row write, never before it."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using')):
+            super().save(*args, **kwargs)
+
+
+class Election(VersionedModel):
     name = models.CharField(max_length=100)
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
     district = models.CharField(max_length=50)
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
 
-class Candidate(models.Model):
+class Candidate(VersionedModel):
     election = models.ForeignKey(Election, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
     photo = models.ImageField(upload_to='candidate_photos/', null=True, blank=True)
+    version = models.BigIntegerField(default=0, db_index=True, editable=False)
+
+class PollingStationDevice(models.Model):
+    """Kiosk that collects votes offline and uploads them in HMAC-signed batches."""
+    name = models.CharField(max_length=100, unique=True)
+    secret = models.CharField(max_length=128)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
 
 class Vote(models.Model):
     voter = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
     candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # set explicitly for queued and uploaded votes so they keep the time they were cast
+    timestamp = models.DateTimeField(default=timezone.now)
+    # kiosk uploads: the device and its record id make resubmission idempotent
+    device = models.ForeignKey(PollingStationDevice, null=True, blank=True, on_delete=models.SET_NULL)
+    client_id = models.CharField(max_length=64, null=True, blank=True)
+
+    class Meta:
+        # one vote per voter per election, enforced by the database
+        constraints = [
+            models.UniqueConstraint(fields=['voter', 'election'], name='unique_vote_per_election'),
+            models.UniqueConstraint(fields=['device', 'client_id'], name='unique_vote_client_id'),
+        ]
+
+
+class CandidateTally(models.Model):
+    """Running vote count for a candidate, updated in the same transaction as each `Vote` insert.
+
+    The election is read through the candidate; an election has few enough
+    candidates that ranking them needs no index of its own.
+    """
+    candidate = models.OneToOneField(Candidate, on_delete=models.CASCADE)
+    votes = models.PositiveIntegerField(default=0)
+
+
+class QueuedVote(models.Model):
+    """Validated vote waiting for the `drain_vote_queue` worker to commit it to `Vote`."""
+    PENDING = 'pending'
+    COMMITTED = 'committed'
+    REJECTED = 'rejected'
+
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (COMMITTED, 'Committed'),
+        (REJECTED, 'Rejected'),
+    ]
+
+    receipt = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    voter = models.ForeignKey('users.User', on_delete=models.CASCADE)
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    candidate = models.ForeignKey(Candidate, on_delete=models.CASCADE)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    detail = models.CharField(max_length=100, blank=True)
+    vote = models.OneToOneField(Vote, null=True, blank=True, on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['voter', 'election'], name='unique_queued_vote_per_election'),
+        ]
+        indexes = [models.Index(fields=['status', 'id'])]
+
+
+class ElectionResult(models.Model):
+    """Frozen totals for a closed election, written once by `finalize_election`."""
+    election = models.OneToOneField(Election, on_delete=models.CASCADE, related_name='final_result')
+    district = models.CharField(max_length=50, db_index=True)
+    total_votes = models.PositiveIntegerField()
+    finalized_at = models.DateTimeField(auto_now_add=True)
+    archive_file = models.CharField(max_length=255, blank=True)
+
+
+class CandidateResult(models.Model):
+    result = models.ForeignKey(ElectionResult, on_delete=models.CASCADE, related_name='candidates')
+    candidate = models.ForeignKey(Candidate, null=True, on_delete=models.SET_NULL)
+    candidate_name = models.CharField(max_length=100)
+    votes = models.PositiveIntegerField()
+
+
+class TurnoutBucket(models.Model):
+    """Votes recorded per election, district and minute, maintained alongside `CandidateTally`."""
+    election = models.ForeignKey(Election, on_delete=models.CASCADE)
+    district = models.CharField(max_length=50)
+    minute = models.DateTimeField()
+    votes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['election', 'district', 'minute'], name='unique_turnout_bucket'),
+        ]
+        indexes = [models.Index(fields=['district', 'minute'])]
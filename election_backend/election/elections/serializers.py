@@ -1,25 +1,72 @@
+from django.conf import settings
 from rest_framework import serializers
-from .models import Election, Candidate, Vote
+from .models import Election, Candidate, Vote, QueuedVote
 
 
 class ElectionSerializer(serializers.ModelSerializer):
     class Meta:
         model = Election
-        fields = ('id', 'name', 'start_time', 'end_time', 'district')
+        fields = ('id', 'name', 'start_time', 'end_time', 'district', 'version')
 
 
 class CandidateSerializer(serializers.ModelSerializer):
     class Meta:
         model = Candidate
-        fields = ('id', 'election', 'name', 'photo')
+        fields = ('id', 'election', 'name', 'photo', 'version')
 
 
 class VoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vote
-        fields = ('id', 'voter', 'candidate', 'timestamp')
-        read_only_fields = ('id', 'timestamp', 'voter')
+        fields = ('id', 'voter', 'election', 'candidate', 'timestamp')
+        read_only_fields = ('id', 'timestamp', 'voter', 'election')
 
 
 class CastVoteSerializer(serializers.Serializer):
-    candidate = serializers.PrimaryKeyRelatedField(queryset=Candidate.objects.all())
\ No newline at end of file
+    candidate = serializers.PrimaryKeyRelatedField(queryset=Candidate.objects.all())
+
+
+class QueuedVoteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = QueuedVote
+        fields = ('receipt', 'election', 'status', 'detail', 'vote', 'created_at', 'processed_at')
+
+
+class DeviceVoteRecordSerializer(serializers.Serializer):
+    voter = serializers.IntegerField()
+    candidate = serializers.IntegerField()
+    client_timestamp = serializers.DateTimeField()
+    client_id = serializers.CharField(max_length=64)
+
+
+class DeviceVoteUploadSerializer(serializers.Serializer):
+    # records are validated one by one so a bad record does not reject the batch
+    records = serializers.ListField(
+        child=serializers.DictField(), allow_empty=False, max_length=settings.DEVICE_UPLOAD_MAX_RECORDS,
+    )
+
+
+class TurnoutQuerySerializer(serializers.Serializer):
+    election = serializers.IntegerField(required=False)
+    district = serializers.CharField(required=False)
+    start = serializers.DateTimeField(required=False)
+    end = serializers.DateTimeField(required=False)
+    # minutes per point in the returned series
+    resolution = serializers.IntegerField(required=False, default=1, min_value=1, max_value=1440)
+
+    def validate(self, attrs):
+        if 'election' not in attrs and 'district' not in attrs:
+            raise serializers.ValidationError('election or district is required')
+        return attrs
+
+
+class CandidateImportSerializer(serializers.Serializer):
+    # the election is checked per chunk instead of one lookup per row
+    election = serializers.IntegerField()
+    name = serializers.CharField(max_length=100)
+
+
+class ImportUploadSerializer(serializers.Serializer):
+    file = serializers.FileField()
+    kind = serializers.ChoiceField(choices=('elections', 'candidates'))
+    format = serializers.ChoiceField(choices=('csv', 'ndjson'), required=False)
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .cache import invalidate_active_elections
+from .models import Candidate, Election, SyncChange
+
+
+def next_version(model_name):
+    """Allocate a new change version; bulk writers stamp a whole batch with one."""
+    return SyncChange.objects.create(model=model_name).id
+
+
+@receiver(pre_save, sender=Election)
+@receiver(pre_save, sender=Candidate)
+def stamp_version(sender, instance, **kwargs):
+    instance.version = next_version(sender._meta.model_name)
+
+
+@receiver(post_delete, sender=Election)
+@receiver(post_delete, sender=Candidate)
+def record_deletion(sender, instance, **kwargs):
+    SyncChange.objects.create(model=sender._meta.model_name, object_id=instance.pk, deleted=True)
+
+
+@receiver(post_save, sender=Election)
+@receiver(post_delete, sender=Election)
+def election_changed(sender, instance, **kwargs):
+    # after commit, or another process could re-cache the old rows until the next boundary
+    transaction.on_commit(invalidate_active_elections)
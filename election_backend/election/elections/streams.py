@@ -0,0 +1,105 @@
+import asyncio
+import json
+import logging
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .models import CandidateTally
+
+logger = logging.getLogger(__name__)
+
+
+def _load_counts(election_id):
+    return dict(CandidateTally.objects.filter(candidate__election_id=election_id).values_list('candidate_id', 'votes'))
+
+
+class ResultsBroadcaster:
+    """Fan out tally changes to every stream subscriber of an election.
+
+    One poller per watched election reads the tallies once per tick and
+    pushes only the counts that changed, so the database cost does not grow
+    with the number of subscribers.
+    """
+
+    def __init__(self, tick):
+        self.tick = tick
+        self._subscribers = {}  # election_id -> set of asyncio.Queue
+        self._counts = {}  # election_id -> {candidate_id: votes}
+        self._pollers = {}
+
+    def subscribe(self, election_id):
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(election_id, set()).add(queue)
+        if election_id in self._counts:
+            # late subscribers start from the full current counts
+            queue.put_nowait(dict(self._counts[election_id]))
+        if election_id not in self._pollers:
+            self._pollers[election_id] = asyncio.ensure_future(self._poll(election_id))
+        return queue
+
+    def unsubscribe(self, election_id, queue):
+        subscribers = self._subscribers.get(election_id)
+        if subscribers is not None:
+            subscribers.discard(queue)
+
+    async def _poll(self, election_id):
+        try:
+            while self._subscribers.get(election_id):
+                try:
+                    counts = await sync_to_async(_load_counts)(election_id)
+                except Exception:
+                    # a failed read must not end the stream for every subscriber; retry next tick
+                    logger.exception('could not load tallies for election %s', election_id)
+                    await asyncio.sleep(self.tick)
+                    continue
+                previous = self._counts.get(election_id)
+                self._counts[election_id] = counts
+                if previous is None:
+                    # the first snapshot goes out even when empty, so subscribers know the stream is live
+                    changes = counts
+                else:
+                    changes = {cid: n for cid, n in counts.items() if previous.get(cid) != n}
+                if changes or previous is None:
+                    for queue in self._subscribers[election_id]:
+                        queue.put_nowait(changes)
+                await asyncio.sleep(self.tick)
+        finally:
+            self._pollers.pop(election_id, None)
+            self._counts.pop(election_id, None)
+            self._subscribers.pop(election_id, None)
+
+
+# one broadcaster per event loop; an ASGI worker runs a single loop
+_broadcasters = weakref.WeakKeyDictionary()
+
+
+def get_broadcaster():
+    loop = asyncio.get_running_loop()
+    broadcaster = _broadcasters.get(loop)
+    if broadcaster is None:
+        broadcaster = _broadcasters[loop] = ResultsBroadcaster(settings.RESULTS_STREAM_TICK)
+    return broadcaster
+
+
+async def result_events(election_id, keepalive=15):
+    """Yield server-sent events with per-candidate count changes, coalesced per tick."""
+    broadcaster = get_broadcaster()
+    queue = broadcaster.subscribe(election_id)
+    try:
+        while True:
+            try:
+                changes = await asyncio.wait_for(queue.get(), timeout=keepalive)
+            except asyncio.TimeoutError:
+                # comment line keeps proxies from closing an idle stream
+                yield ': keep-alive\n\n'
+                continue
+            # a slow client gets everything that piled up as a single event
+            changes = dict(changes)
+            while not queue.empty():
+                changes.update(queue.get_nowait())
+            results = [{'candidate_id': cid, 'votes': n} for cid, n in changes.items()]
+            yield 'data: {}\n\n'.format(json.dumps({'election': election_id, 'results': results}))
+    finally:
+        broadcaster.unsubscribe(election_id, queue)
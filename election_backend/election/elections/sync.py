@@ -0,0 +1,90 @@
+"""Delta sync feed of elections and candidates for polling-station devices.
+
+A version is the id of a `SyncChange` row, taken in the same transaction as
+the row write it stamps (see `VersionedModel.save`). Ids are allocated before
+commit, though, so a transaction holding id N can commit after one holding
+N + 1; handing out N + 1 as the client's cursor would skip N for good.
+`high_water_mark` therefore only covers ids allocated more than
+``SYNC_INFLIGHT_MARGIN`` seconds ago, by which time every write that took a
+smaller id has committed. Rows newer than the mark are left for the next call.
+"""
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Candidate, Election, SyncChange
+
+
+def high_water_mark(now=None):
+    """The highest version every committed change is known to be at or below."""
+    cutoff = (now or timezone.now()) - timedelta(seconds=settings.SYNC_INFLIGHT_MARGIN)
+    return SyncChange.objects.filter(created_at__lte=cutoff).order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def _pruned_past(since):
+    # tombstones up to the oldest kept row may have been pruned by prune_sync_changes
+    oldest = SyncChange.objects.order_by('id').values_list('id', flat=True).first()
+    return oldest is not None and since < oldest - 1
+
+
+def changes(since=0, limit=None):
+    """Return one page of changes after version ``since``.
+
+    The page holds about ``limit`` (``SYNC_PAGE_SIZE``) rows and tombstones in
+    version order; ``more`` says whether another page follows. ``reset`` means
+    ``since`` predates pruned history and this is a full snapshot instead.
+    """
+    limit = limit or settings.SYNC_PAGE_SIZE
+    reset = bool(since) and _pruned_past(since)
+    if reset:
+        since = 0
+    until = max(high_water_mark(), since)
+
+    def in_range(queryset, field='version'):
+        queryset = queryset.filter(**{f'{field}__lte': until})
+        return queryset.filter(**{f'{field}__gt': since}) if since else queryset
+
+    rows = {'elections': in_range(Election.objects.all()), 'candidates': in_range(Candidate.objects.all())}
+    # a snapshot has nothing to delete yet
+    tombstones = in_range(SyncChange.objects.filter(deleted=True), 'id') if since else SyncChange.objects.none()
+
+    versions = sorted(chain(
+        *(queryset.order_by('version').values_list('version', flat=True)[:limit + 1] for queryset in rows.values()),
+        tombstones.order_by('id').values_list('id', flat=True)[:limit + 1],
+    ))
+    more = len(versions) > limit
+    if more:
+        # cut between versions: an import chunk stamps many rows with one version,
+        # and a group bigger than a page is sent whole
+        cut = versions[limit]
+        until = cut - 1 if versions[0] < cut else cut
+        rows = {name: queryset.filter(version__lte=until) for name, queryset in rows.items()}
+        tombstones = tombstones.filter(id__lte=until)
+
+    deleted = {'elections': [], 'candidates': []}
+    for model, object_id in tombstones.values_list('model', 'object_id'):
+        deleted[f'{model}s'].append(object_id)
+    return {
+        'version': until,
+        'more': more,
+        'reset': reset,
+        'elections': rows['elections'].order_by('version', 'id'),
+        'candidates': rows['candidates'].order_by('version', 'id'),
+        'deleted': deleted,
+    }
+
+
+def prune_changes(before, chunk_size):
+    """Delete `SyncChange` rows created before ``before`` in chunks, always keeping the newest row."""
+    newest = SyncChange.objects.order_by('-id').values_list('id', flat=True).first()
+    stale = SyncChange.objects.filter(Q(created_at__lt=before) & ~Q(id=newest)).order_by('id')
+    total = 0
+    while True:
+        ids = list(stale.values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return total
+        SyncChange.objects.filter(id__in=ids).delete()
+        total += len(ids)
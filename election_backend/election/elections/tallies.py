@@ -0,0 +1,84 @@
+from collections import Counter
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncMinute
+
+from .models import CandidateTally, Election, ElectionResult, TurnoutBucket, Vote
+
+
+def _add(model, key, n):
+    """Add ``n`` to the counter row identified by ``key``, creating it if needed."""
+    updated = model.objects.filter(**key).update(votes=F('votes') + n)
+    if updated:
+        return
+    try:
+        # first vote for this row; a concurrent writer may create it first
+        with transaction.atomic():
+            model.objects.create(votes=n, **key)
+    except IntegrityError:
+        model.objects.filter(**key).update(votes=F('votes') + n)
+
+
+def increment_tallies(counts):
+    """Add ``{candidate_id: n}`` to the running tallies.
+
+    Must be called inside the transaction that inserts the votes so the
+    counters never drift from the `Vote` table.
+    """
+    for candidate_id, n in counts.items():
+        _add(CandidateTally, {'candidate_id': candidate_id}, n)
+
+
+def increment_turnout(counts):
+    """Add ``{(election_id, district, minute): n}`` to the turnout buckets, like `increment_tallies`."""
+    for (election_id, district, minute), n in counts.items():
+        _add(TurnoutBucket, {'election_id': election_id, 'district': district, 'minute': minute}, n)
+
+
+def record_votes(votes):
+    """Update the tallies and turnout buckets for freshly inserted votes."""
+    increment_tallies(Counter(v.candidate_id for v in votes))
+
+    # votes created from an Election instance already carry the district
+    districts = {v.election_id: v.election.district for v in votes if Vote.election.is_cached(v)}
+    missing = {v.election_id for v in votes} - districts.keys()
+    if missing:
+        districts.update(Election.objects.filter(pk__in=missing).values_list('id', 'district'))
+    increment_turnout(Counter(
+        (v.election_id, districts[v.election_id], v.timestamp.replace(second=0, microsecond=0)) for v in votes
+    ))
+
+
+def rebuild_tallies(election_ids=None):
+    """Recompute tallies and turnout buckets from the `Vote` table; returns the number of rows written.
+
+    Elections whose votes were archived at finalization are left untouched.
+    """
+    archived = ElectionResult.objects.exclude(archive_file='').values('election_id')
+    tallies = CandidateTally.objects.exclude(candidate__election_id__in=archived)
+    buckets = TurnoutBucket.objects.exclude(election_id__in=archived)
+    votes = Vote.objects.exclude(election_id__in=archived)
+    if election_ids:
+        tallies = tallies.filter(candidate__election_id__in=election_ids)
+        buckets = buckets.filter(election_id__in=election_ids)
+        votes = votes.filter(election_id__in=election_ids)
+
+    counts = votes.values('candidate_id').annotate(n=Count('id'))
+    turnout = (
+        votes.annotate(minute=TruncMinute('timestamp'))
+        .values('election_id', 'election__district', 'minute')
+        .annotate(n=Count('id'))
+    )
+    with transaction.atomic():
+        tallies.delete()
+        buckets.delete()
+        rows = CandidateTally.objects.bulk_create([
+            CandidateTally(candidate_id=row['candidate_id'], votes=row['n'])
+            for row in counts
+        ])
+        rows += TurnoutBucket.objects.bulk_create([
+            TurnoutBucket(election_id=row['election_id'], district=row['election__district'], minute=row['minute'], votes=row['n'])
+            for row in turnout
+        ])
+    return len(rows)
@@ -1,3 +1,517 @@
-from django.test import TestCase
+import asyncio
+import contextlib
+import hashlib
+import hmac
+import io
+import json
+import tempfile
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models.signals import pre_save
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.models import User
+
+from . import finalize
+from .cache import active_elections, invalidate_active_elections
+from .importers import ImportFormatError, import_records, read_records
+from .ingest import drain_vote_queue
+from .models import (
+    Candidate, CandidateTally, Election, ElectionResult, PollingStationDevice, QueuedVote, SyncChange, TurnoutBucket, Vote,
+)
+from .signals import next_version
+from .streams import ResultsBroadcaster
+from .sync import prune_changes
+from .tallies import rebuild_tallies, record_votes
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_election(name='e', **kwargs):
+    now = timezone.now()
+    return Election.objects.create(
+        name=name, start_time=now - timedelta(hours=1), end_time=now + timedelta(hours=1), district='d', **kwargs,
+    )
+
+
+@override_settings(CACHES=LOCMEM, SYNC_INFLIGHT_MARGIN=0, SYNC_PAGE_SIZE=1000)
+class SyncTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def sync(self, since=None):
+        response = self.client.get('/api/elections/sync/', {'since': since} if since is not None else {})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_version_stamped_in_the_row_transaction(self):
+        seen = []
+
+        def record(sender, **kwargs):
+            seen.append(connection.in_atomic_block)
+
+        pre_save.connect(record, sender=Election)
+        try:
+            make_election()
+        finally:
+            pre_save.disconnect(record, sender=Election)
+        self.assertEqual(seen, [True])
+
+    def test_in_flight_version_is_not_skipped(self):
+        # a writer has allocated a version but not committed its row yet
+        in_flight = next_version('election')
+        later = make_election('later')
+        with override_settings(SYNC_INFLIGHT_MARGIN=60):
+            page = self.sync()
+        self.assertLess(page['version'], in_flight)
+
+        # the slow writer commits; the client's cursor has not passed its version
+        earlier = make_election('earlier')
+        Election.objects.filter(pk=earlier.pk).update(version=in_flight)
+        page = self.sync(page['version'])
+        self.assertEqual({e['id'] for e in page['elections']}, {earlier.pk, later.pk})
+
+    def test_pages_cut_between_versions(self):
+        elections = [make_election(str(i)) for i in range(3)]
+        with override_settings(SYNC_PAGE_SIZE=2):
+            first = self.sync()
+            self.assertTrue(first['more'])
+            self.assertEqual([e['id'] for e in first['elections']], [e.pk for e in elections[:2]])
+            second = self.sync(first['version'])
+        self.assertFalse(second['more'])
+        self.assertEqual([e['id'] for e in second['elections']], [elections[2].pk])
+
+    def test_version_group_larger_than_a_page_is_sent_whole(self):
+        election = make_election()
+        version = next_version('candidate')
+        Candidate.objects.bulk_create([Candidate(election=election, name=str(i), version=version) for i in range(3)])
+        with override_settings(SYNC_PAGE_SIZE=2):
+            page = self.sync(election.version)
+        self.assertEqual(len(page['candidates']), 3)
+
+    def test_deletions_reported(self):
+        election = make_election()
+        election_id = election.pk
+        since = self.sync()['version']
+        election.delete()
+        self.assertEqual(self.sync(since)['deleted']['elections'], [election_id])
+
+    def test_version_older_than_pruned_history_resets(self):
+        old = make_election('old')
+        since = self.sync()['version']
+        old.delete()
+        make_election('new')
+        make_election('newest')
+        prune_changes(timezone.now() + timedelta(seconds=1), chunk_size=1)
+        self.assertEqual(SyncChange.objects.count(), 1)
+        page = self.sync(since)
+        self.assertTrue(page['reset'])
+        self.assertEqual(page['deleted'], {'elections': [], 'candidates': []})
+        self.assertEqual(len(page['elections']), 2)
+
+
+@override_settings(CACHES=LOCMEM)
+class DrainVoteQueueTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.candidate = Candidate.objects.create(election=self.election, name='c')
+        self.voters = [User.objects.create_user(f'v{i}', nid=str(i), phone=str(i)) for i in range(3)]
+        for voter in self.voters:
+            QueuedVote.objects.create(voter=voter, election=self.election, candidate=self.candidate)
+
+    def test_direct_vote_racing_the_batch_rejects_only_that_row(self):
+        racer = self.voters[1]
+        filter_votes = Vote.objects.filter
+
+        def direct_vote_lands_after_check(*args, **kwargs):
+            already_voted = list(filter_votes(*args, **kwargs).values_list('voter_id', 'election_id'))
+            Vote.objects.create(voter=racer, election=self.election, candidate=self.candidate)
+            return mock.Mock(**{'values_list.return_value': already_voted})
+
+        with mock.patch.object(Vote.objects, 'filter', side_effect=direct_vote_lands_after_check):
+            self.assertEqual(drain_vote_queue(), 3)
+
+        statuses = dict(QueuedVote.objects.values_list('voter_id', 'status'))
+        self.assertEqual(statuses, {
+            self.voters[0].pk: QueuedVote.COMMITTED,
+            racer.pk: QueuedVote.REJECTED,
+            self.voters[2].pk: QueuedVote.COMMITTED,
+        })
+        self.assertEqual(Vote.objects.count(), 3)
+        self.assertEqual(drain_vote_queue(), 0)
+
+
+@override_settings(CACHES=LOCMEM)
+class ImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+
+    def run_import(self, body, fmt):
+        return import_records('candidates', read_records(io.BytesIO(body), fmt))
+
+    def test_bad_ndjson_line_reported_as_invalid_json(self):
+        body = b'{"election": %d, "name": "a"}\n{"election": \n[1]\n' % self.election.pk
+        report = self.run_import(body, 'ndjson')
+        self.assertEqual(report['created'], 1)
+        self.assertEqual([e['row'] for e in report['errors']], [2, 3])
+        for error in report['errors']:
+            self.assertTrue(error['errors']['non_field_errors'][0].startswith('invalid JSON'))
+
+    def test_non_utf8_names_its_line_and_keeps_earlier_rows(self):
+        body = b'election,name\n%d,a\n%d,\xff\n' % (self.election.pk, self.election.pk)
+        with self.assertRaises(ImportFormatError) as raised:
+            self.run_import(body, 'csv')
+        self.assertEqual(raised.exception.line, 3)
+        self.assertEqual(raised.exception.report['created'], 1)
+        self.assertEqual(Candidate.objects.count(), 1)
+
+    def test_malformed_csv_names_its_line(self):
+        body = b'election,name\n%d,%s\n' % (self.election.pk, b'x' * 200000)
+        with self.assertRaises(ImportFormatError) as raised:
+            self.run_import(body, 'csv')
+        self.assertEqual(raised.exception.line, 2)
+
+
+class ResultsBroadcasterTests(TestCase):
+    async def first_event(self, broadcaster, election_id):
+        queue = broadcaster.subscribe(election_id)
+        poller = broadcaster._pollers[election_id]
+        try:
+            return await asyncio.wait_for(queue.get(), timeout=5)
+        finally:
+            # stop the poller instead of leaving it running after the test
+            broadcaster.unsubscribe(election_id, queue)
+            poller.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await poller
+
+    async def test_empty_snapshot_sent_to_first_subscriber(self):
+        with mock.patch('elections.streams._load_counts', return_value={}):
+            self.assertEqual(await self.first_event(ResultsBroadcaster(0), 1), {})
+
+    async def test_failed_poll_is_retried(self):
+        failures = [RuntimeError('database is locked')]
+
+        def load(election_id):
+            if failures:
+                raise failures.pop()
+            return {7: 3}
+
+        with mock.patch('elections.streams._load_counts', load), self.assertLogs('elections.streams', 'ERROR'):
+            self.assertEqual(await self.first_event(ResultsBroadcaster(0), 1), {7: 3})
+
+
+@override_settings(CACHES=LOCMEM, RESULTS_STREAM_TICK=0)
+class ResultsStreamViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.url = f'/api/elections/{self.election.pk}/results/stream/'
+        user = User.objects.create_user('officer', nid='1', phone='1')
+        self.auth = {'headers': {'Authorization': f'Bearer {AccessToken.for_user(user)}'}}
+
+    async def test_credentials_required(self):
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 401)
+        with mock.patch('elections.views.has_role', return_value=False):
+            self.assertEqual((await self.async_client.get(self.url, **self.auth)).status_code, 403)
+
+    async def test_first_event_is_the_snapshot(self):
+        with mock.patch('elections.views.has_role', return_value=True):
+            response = await self.async_client.get(self.url, **self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            first = await asyncio.wait_for(anext(events), timeout=5)
+        finally:
+            await events.aclose()
+        payload = json.loads(first.decode().removeprefix('data: '))
+        self.assertEqual(payload, {'election': self.election.pk, 'results': []})
+
+
+@override_settings(CACHES=LOCMEM, ELECTION_FINALIZE_GRACE=0)
+@mock.patch('elections.views.has_role', return_value=True)
+class FinalizeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.candidate = Candidate.objects.create(election=self.election, name='c')
+        voter = User.objects.create_user('v', nid='1', phone='1')
+        Vote.objects.create(voter=voter, election=self.election, candidate=self.candidate)
+        Election.objects.filter(pk=self.election.pk).update(end_time=timezone.now() - timedelta(minutes=1))
+        self.election.refresh_from_db()
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        patcher = mock.patch.object(finalize, 'ARCHIVE_DIR', Path(archive_dir.name))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def test_finalized_election_cannot_be_reopened(self, has_role):
+        finalize.finalize_election(self.election)
+        url = f'/api/elections/{self.election.pk}/'
+        response = self.client.put(url, {'end_time': (timezone.now() + timedelta(hours=1)).isoformat()}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.client.put(url, {'name': 'renamed'}, format='json').status_code, 200)
+        response = self.client.post(f'/api/elections/{self.election.pk}/candidates/', {'name': 'late'})
+        self.assertEqual(response.status_code, 409)
+
+    def test_reading_results_does_not_finalize(self, has_role):
+        self.client.force_authenticate(User.objects.get(username='v'))
+        response = self.client.get(f'/api/elections/{self.election.pk}/results/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('finalized', response.data)
+        self.assertFalse(ElectionResult.objects.exists())
+
+    def test_grace_period_holds_finalization_back(self, has_role):
+        with override_settings(ELECTION_FINALIZE_GRACE=3600):
+            call_command('finalize_elections', stdout=io.StringIO())
+            self.assertFalse(ElectionResult.objects.exists())
+            with self.assertRaises(ValueError):
+                finalize.finalize_election(self.election)
+        call_command('finalize_elections', stdout=io.StringIO())
+        self.assertTrue(ElectionResult.objects.filter(election=self.election).exists())
+
+    def test_archive_keeps_votes_unless_asked_to_delete(self, has_role):
+        call_command('finalize_elections', '--archive', stdout=io.StringIO())
+        result = ElectionResult.objects.get(election=self.election)
+        self.assertTrue((finalize.ARCHIVE_DIR / result.archive_file).exists())
+        self.assertEqual(Vote.objects.count(), 1)
+
+        with self.assertRaises(CommandError):
+            call_command('finalize_elections', '--delete-votes', stdout=io.StringIO())
+        call_command('finalize_elections', '--archive', '--delete-votes', stdout=io.StringIO())
+        self.assertEqual(Vote.objects.count(), 0)
+
+
+@override_settings(CACHES=LOCMEM)
+class ActiveElectionsCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_saves_outside_the_api_invalidate(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            election = make_election()
+        self.assertIn(election.pk, active_elections())
+
+        election.end_time = timezone.now() - timedelta(minutes=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            election.save()
+        self.assertNotIn(election.pk, active_elections())
+
+        election.end_time = timezone.now() + timedelta(hours=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            election.save()
+        self.assertIn(election.pk, active_elections())
+        with self.captureOnCommitCallbacks(execute=True):
+            election.delete()
+        self.assertEqual(active_elections(), {})
+
+
+@override_settings(CACHES=LOCMEM)
+@mock.patch('elections.views.has_role', return_value=True)
+class TallyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.a, self.b = (Candidate.objects.create(election=self.election, name=name) for name in 'ab')
+        self.voters = [User.objects.create_user(f'v{i}', nid=str(i), phone=str(i)) for i in range(3)]
+        self.client = APIClient()
+
+    def vote(self, voter, candidate):
+        self.client.force_authenticate(voter)
+        return self.client.post(f'/api/elections/{self.election.pk}/vote/', {'candidate': candidate.pk})
+
+    def tallies(self):
+        return dict(CandidateTally.objects.values_list('candidate_id', 'votes'))
+
+    def test_votes_update_tallies_and_results(self, has_role):
+        for voter, candidate in zip(self.voters, (self.a, self.b, self.b)):
+            self.assertEqual(self.vote(voter, candidate).status_code, 201)
+        self.assertEqual(self.tallies(), {self.a.pk: 1, self.b.pk: 2})
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/elections/{self.election.pk}/results/')
+        self.assertEqual([(r['candidate_name'], r['votes']) for r in response.data['results']], [('b', 2), ('a', 1)])
+
+    def test_rebuild_repairs_drift(self, has_role):
+        self.vote(self.voters[0], self.a)
+        Vote.objects.create(voter=self.voters[1], election=self.election, candidate=self.b)
+        CandidateTally.objects.filter(candidate=self.a).update(votes=7)
+        call_command('rebuild_tallies', stdout=io.StringIO())
+        self.assertEqual(self.tallies(), {self.a.pk: 1, self.b.pk: 1})
+
+    def test_rebuild_keeps_archived_elections(self, has_role):
+        self.vote(self.voters[0], self.a)
+        ElectionResult.objects.create(election=self.election, district='d', total_votes=1, archive_file='votes.csv.gz')
+        Vote.objects.all().delete()
+        rebuild_tallies()
+        self.assertEqual(self.tallies(), {self.a.pk: 1})
+
+
+@override_settings(CACHES=LOCMEM)
+class CastVoteTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.candidate = Candidate.objects.create(election=self.election, name='c')
+        self.voter = User.objects.create_user('v', nid='1', phone='1')
+        self.client = APIClient()
+        self.client.force_authenticate(self.voter)
+
+    def vote(self, election, candidate):
+        return self.client.post(f'/api/elections/{election.pk}/vote/', {'candidate': candidate.pk})
+
+    def test_second_vote_rejected(self):
+        self.assertEqual(self.vote(self.election, self.candidate).status_code, 201)
+        response = self.vote(self.election, self.candidate)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['detail'], 'user has already voted in this election')
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(CandidateTally.objects.get().votes, 1)
+
+    def test_one_vote_per_election_enforced_by_the_database(self):
+        Vote.objects.create(voter=self.voter, election=self.election, candidate=self.candidate)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Vote.objects.create(voter=self.voter, election=self.election, candidate=self.candidate)
+
+    def test_vote_in_another_election_allowed(self):
+        other = make_election('other')
+        self.vote(self.election, self.candidate)
+        self.assertEqual(self.vote(other, Candidate.objects.create(election=other, name='c')).status_code, 201)
+
+    def test_candidate_must_belong_to_the_election(self):
+        other = make_election('other')
+        response = self.vote(other, self.candidate)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_closed_election_rejected(self):
+        Election.objects.filter(pk=self.election.pk).update(end_time=timezone.now() - timedelta(minutes=1))
+        invalidate_active_elections()
+        self.assertEqual(self.vote(self.election, self.candidate).data['detail'], 'election is not active')
+
+
+@override_settings(CACHES=LOCMEM)
+class DeviceUploadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.election = make_election()
+        self.candidate = Candidate.objects.create(election=self.election, name='c')
+        self.voters = [User.objects.create_user(f'v{i}', nid=str(i), phone=str(i)) for i in range(3)]
+        self.device = PollingStationDevice.objects.create(name='kiosk-1', secret='s3cret')
+        self.client = APIClient()
+
+    def record(self, voter, client_id, cast_at=None):
+        cast_at = cast_at or timezone.now() - timedelta(minutes=5)
+        return {'voter': voter.pk, 'candidate': self.candidate.pk, 'client_timestamp': cast_at.isoformat(), 'client_id': client_id}
+
+    def upload(self, records, secret='s3cret', device='kiosk-1'):
+        body = json.dumps({'records': records}).encode()
+        signature = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        return self.client.post('/api/elections/votes/upload/', body, content_type='application/json',
+                                HTTP_X_DEVICE=device, HTTP_X_SIGNATURE=signature)
+
+    def statuses(self, response):
+        return [r['status'] for r in response.data['results']]
+
+    def test_bad_signature_or_device_rejected(self):
+        records = [self.record(self.voters[0], 'a')]
+        self.assertEqual(self.upload(records, secret='wrong').status_code, 403)
+        self.assertEqual(self.upload(records, device='kiosk-2').status_code, 403)
+        PollingStationDevice.objects.update(is_active=False)
+        self.assertEqual(self.upload(records).status_code, 403)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_batch_recorded_with_per_record_outcomes(self):
+        Vote.objects.create(voter=self.voters[2], election=self.election, candidate=self.candidate)
+        response = self.upload([
+            self.record(self.voters[0], 'a'),
+            {'client_id': 'broken'},
+            self.record(self.voters[1], 'b', cast_at=self.election.start_time - timedelta(minutes=1)),
+            self.record(self.voters[2], 'c'),
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.statuses(response), ['recorded', 'invalid', 'rejected', 'rejected'])
+        vote = Vote.objects.get(client_id='a')
+        self.assertEqual((vote.device_id, vote.voter_id), (self.device.pk, self.voters[0].pk))
+        self.assertEqual(CandidateTally.objects.get().votes, 1)
+
+    def test_replayed_upload_is_idempotent(self):
+        records = [self.record(self.voters[0], 'a'), self.record(self.voters[1], 'b')]
+        first = self.upload(records)
+        second = self.upload(records)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Vote.objects.count(), 2)
+        self.assertEqual(CandidateTally.objects.get().votes, 2)
+
+    def test_late_upload_accepted_until_finalized(self):
+        cast_at = timezone.now() - timedelta(minutes=5)
+        Election.objects.filter(pk=self.election.pk).update(end_time=timezone.now() - timedelta(minutes=1))
+        self.assertEqual(self.statuses(self.upload([self.record(self.voters[0], 'a', cast_at)])), ['recorded'])
+        ElectionResult.objects.create(election=self.election, district='d', total_votes=1)
+        response = self.upload([self.record(self.voters[1], 'b', cast_at)])
+        self.assertEqual(response.data['results'][0]['detail'], 'election results are final')
+
+
+@override_settings(CACHES=LOCMEM)
+@mock.patch('elections.views.has_role', return_value=True)
+class TurnoutTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.start = datetime(2026, 5, 1, 8, 0, tzinfo=dt_timezone.utc)
+        self.north = Election.objects.create(name='n', start_time=self.start, end_time=self.start + timedelta(hours=12), district='North')
+        self.south = Election.objects.create(name='s', start_time=self.start, end_time=self.start + timedelta(hours=12), district='South')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('officer', nid='0', phone='0'))
+        self.count = 0
+
+    def cast(self, election, *minutes):
+        candidate = Candidate.objects.get_or_create(election=election, name='c')[0]
+        votes = []
+        for minute in minutes:
+            self.count += 1
+            voter = User.objects.create_user(f'v{self.count}', nid=str(self.count), phone=str(self.count))
+            votes.append(Vote.objects.create(
+                voter=voter, election=election, candidate=candidate,
+                timestamp=self.start + timedelta(minutes=minute, seconds=30),
+            ))
+        record_votes(votes)
+
+    def series(self, **params):
+        response = self.client.get('/api/elections/turnout/', params)
+        self.assertEqual(response.status_code, 200)
+        return [(point['time'], point['votes']) for point in response.data['series']]
+
+    def test_votes_bucketed_per_minute(self, has_role):
+        self.cast(self.north, 0, 0, 1, 7)
+        self.assertEqual(
+            sorted(TurnoutBucket.objects.values_list('minute', 'votes')),
+            [(self.start, 2), (self.start + timedelta(minutes=1), 1), (self.start + timedelta(minutes=7), 1)],
+        )
+
+    def test_series_rolls_up_to_resolution(self, has_role):
+        self.cast(self.north, 0, 1, 4, 5, 12)
+        self.assertEqual(self.series(election=self.north.pk, resolution=5), [
+            (self.start, 3), (self.start + timedelta(minutes=5), 1), (self.start + timedelta(minutes=10), 1),
+        ])
+
+    def test_series_filtered_by_district_and_range(self, has_role):
+        self.cast(self.north, 0, 30)
+        self.cast(self.south, 0)
+        self.assertEqual(self.series(district='North', resolution=60), [(self.start, 2)])
+        window = {'district': 'North', 'start': (self.start + timedelta(minutes=10)).isoformat()}
+        self.assertEqual(self.series(**window), [(self.start + timedelta(minutes=30), 1)])
+
+    def test_election_or_district_required(self, has_role):
+        self.assertEqual(self.client.get('/api/elections/turnout/').status_code, 400)
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db.models import Sum
+
+from .models import TurnoutBucket
+
+
+def turnout_series(election_id=None, district=None, start=None, end=None, resolution=1):
+    """Roll the per-minute turnout buckets up to ``resolution``-minute points.
+
+    Reads one row per minute in range, so the cost does not depend on how
+    many votes were cast.
+    """
+    buckets = TurnoutBucket.objects.all()
+    if election_id is not None:
+        buckets = buckets.filter(election_id=election_id)
+    if district is not None:
+        buckets = buckets.filter(district=district)
+    if start is not None:
+        buckets = buckets.filter(minute__gte=start)
+    if end is not None:
+        buckets = buckets.filter(minute__lte=end)
+
+    series = {}
+    for minute, votes in buckets.values('minute').annotate(n=Sum('votes')).values_list('minute', 'n').order_by('minute'):
+        epoch_minutes = int(minute.timestamp()) // 60
+        point = epoch_minutes - epoch_minutes % resolution
+        series[point] = series.get(point, 0) + votes
+    return [
+        {'time': datetime.fromtimestamp(point * 60, tz=dt_timezone.utc), 'votes': votes}
+        for point, votes in series.items()
+    ]
@@ -0,0 +1,97 @@
+import hashlib
+import hmac
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Candidate, Vote
+from .tallies import record_votes
+from users.models import User
+
+
+def signature_is_valid(device, body, signature):
+    """Check the hex HMAC-SHA256 of the raw request body against the device secret."""
+    expected = hmac.new(device.secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or '')
+
+
+def ingest_device_votes(device, records):
+    """Insert a batch of validated kiosk records and return ``{client_id: outcome}``.
+
+    Every check is set-based over the whole batch: one query each for
+    previously uploaded client ids, candidates with their election window,
+    voters and existing votes. Accepted records go in with one ``bulk_create``.
+    """
+    outcomes = {}
+    client_ids = [r['client_id'] for r in records]
+    for client_id, vote_id in Vote.objects.filter(device=device, client_id__in=client_ids).values_list('client_id', 'id'):
+        # resubmission of an uploaded record: report it again, insert nothing
+        outcomes[client_id] = {'status': 'recorded', 'vote_id': vote_id}
+
+    pending = [r for r in records if r['client_id'] not in outcomes]
+    candidates = {
+        row[0]: row[1:]
+        for row in Candidate.objects.filter(pk__in={r['candidate'] for r in pending}).values_list(
+            'id', 'election_id', 'election__start_time', 'election__end_time', 'election__final_result',
+        )
+    }
+    voters = set(User.objects.filter(pk__in={r['voter'] for r in pending}).values_list('id', flat=True))
+    voted = set(
+        Vote.objects.filter(
+            voter_id__in={r['voter'] for r in pending},
+            election_id__in={c[0] for c in candidates.values()},
+        ).values_list('voter_id', 'election_id')
+    )
+
+    now = timezone.now()
+    accepted = []
+    for r in pending:
+        candidate = candidates.get(r['candidate'])
+        if candidate is None:
+            outcomes[r['client_id']] = {'status': 'rejected', 'detail': 'candidate not found'}
+            continue
+        election_id, start_time, end_time, final_result = candidate
+        if r['voter'] not in voters:
+            outcomes[r['client_id']] = {'status': 'rejected', 'detail': 'voter not found'}
+        elif final_result is not None:
+            outcomes[r['client_id']] = {'status': 'rejected', 'detail': 'election results are final'}
+        elif not (start_time <= r['client_timestamp'] <= end_time) or r['client_timestamp'] > now:
+            outcomes[r['client_id']] = {'status': 'rejected', 'detail': 'vote cast outside the election window'}
+        elif (r['voter'], election_id) in voted:
+            outcomes[r['client_id']] = {'status': 'rejected', 'detail': 'user has already voted in this election'}
+        else:
+            voted.add((r['voter'], election_id))
+            accepted.append(Vote(
+                voter_id=r['voter'], election_id=election_id, candidate_id=r['candidate'],
+                timestamp=r['client_timestamp'], device=device, client_id=r['client_id'],
+            ))
+
+    try:
+        with transaction.atomic():
+            Vote.objects.bulk_create(accepted)
+            record_votes(accepted)
+    except IntegrityError:
+        # a concurrent vote or upload won a race; settle the batch one record at a time
+        accepted = _insert_one_by_one(accepted, outcomes)
+    for vote in accepted:
+        outcomes[vote.client_id] = {'status': 'recorded', 'vote_id': vote.id}
+    return outcomes
+
+
+def _insert_one_by_one(votes, outcomes):
+    inserted = []
+    for vote in votes:
+        try:
+            with transaction.atomic():
+                vote.save(force_insert=True)
+                record_votes([vote])
+        except IntegrityError:
+            vote.pk = None
+            existing = Vote.objects.filter(device=vote.device, client_id=vote.client_id).values_list('id', flat=True).first()
+            if existing is not None:
+                outcomes[vote.client_id] = {'status': 'recorded', 'vote_id': existing}
+            else:
+                outcomes[vote.client_id] = {'status': 'rejected', 'detail': 'user has already voted in this election'}
+        else:
+            inserted.append(vote)
+    return inserted
@@ -3,8 +3,14 @@ from . import views
 
 urlpatterns = [
     path('', views.ElectionsListCreateView.as_view(), name='elections-list'),
+    path('import/', views.ImportView.as_view(), name='elections-import'),
+    path('turnout/', views.TurnoutView.as_view(), name='elections-turnout'),
+    path('sync/', views.SyncView.as_view(), name='elections-sync'),
     path('<int:pk>/', views.ElectionDetailView.as_view(), name='election-detail'),
     path('<int:election_id>/candidates/', views.CandidatesView.as_view(), name='election-candidates'),
     path('<int:election_id>/vote/', views.CastVoteView.as_view(), name='election-vote'),
+    path('votes/upload/', views.DeviceVoteUploadView.as_view(), name='device-vote-upload'),
+    path('votes/<uuid:receipt>/', views.VoteReceiptView.as_view(), name='vote-receipt'),
     path('<int:election_id>/results/', views.ResultsView.as_view(), name='election-results'),
+    path('<int:election_id>/results/stream/', views.ResultsStreamView.as_view(), name='election-results-stream'),
 ]
@@ -1,39 +1,52 @@
 from rest_framework.views import APIView
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.settings import api_settings
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django.shortcuts import get_object_or_404
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
 from django.utils import timezone
-from django.db.models import Count
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, transaction
 from drf_yasg.utils import swagger_auto_schema
 
-from .models import Election, Candidate, Vote
+from .models import Election, Candidate, Vote, CandidateTally, QueuedVote, ElectionResult, PollingStationDevice
 from .serializers import (
     ElectionSerializer,
     CandidateSerializer,
     VoteSerializer,
     CastVoteSerializer,
+    QueuedVoteSerializer,
+    DeviceVoteRecordSerializer,
+    DeviceVoteUploadSerializer,
+    TurnoutQuerySerializer,
+    ImportUploadSerializer,
 )
-from access_control.models import RoleAssignment
-
-
-def _user_has_role(user, role_name):
-    return RoleAssignment.objects.filter(user=user, role__name__iexact=role_name).exists()
+from .cache import active_elections
+from .importers import ImportFormatError, import_records, read_records
+from .streams import result_events
+from .sync import changes
+from .tallies import record_votes
+from .turnout import turnout_series
+from .uploads import ingest_device_votes, signature_is_valid
+from access_control.policies import is_allowed
+from access_control.roles import has_role
 
 
 class ElectionsListCreateView(APIView):
     permission_classes = (AllowAny,)
 
     def get(self, request):
-        now = timezone.now()
-        elections = Election.objects.filter(start_time__lte=now, end_time__gte=now)
-        serializer = ElectionSerializer(elections, many=True)
+        serializer = ElectionSerializer(active_elections().values(), many=True)
         return Response(serializer.data)
 
     @swagger_auto_schema(request_body=ElectionSerializer)
     def post(self, request):
         # Admin or Officer
-        if not request.user.is_authenticated or not (_user_has_role(request.user, 'Admin') or _user_has_role(request.user, 'Officer')):
+        if not has_role(request, 'Admin', 'Officer'):
             return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = ElectionSerializer(data=request.data)
@@ -43,6 +56,33 @@ class ElectionsListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class ImportView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(request_body=ImportUploadSerializer)
+    def post(self, request):
+        # Admin or Officer
+        if not has_role(request, 'Admin', 'Officer'):
+            return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = ImportUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        upload = serializer.validated_data['file']
+        fmt = serializer.validated_data.get('format') or ('csv' if upload.name.lower().endswith('.csv') else 'ndjson')
+        try:
+            report = import_records(serializer.validated_data['kind'], read_records(upload.file, fmt))
+        except ImportFormatError as e:
+            # rows before the broken line were imported; report them with the error
+            return Response({'detail': str(e), 'line': e.line, **e.report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+# fields that cannot change once an ElectionResult has been written
+FINALIZED_FIELDS = {'start_time', 'end_time'}
+
+
 class ElectionDetailView(APIView):
     permission_classes = (AllowAny,)
 
@@ -53,18 +93,21 @@ class ElectionDetailView(APIView):
     @swagger_auto_schema(request_body=ElectionSerializer)
     def put(self, request, pk):
         # Admin or Officer
-        if not request.user.is_authenticated or not (_user_has_role(request.user, 'Admin') or _user_has_role(request.user, 'Officer')):
+        if not has_role(request, 'Admin', 'Officer'):
             return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
         election = get_object_or_404(Election, pk=pk)
         serializer = ElectionSerializer(election, data=request.data, partial=True)
         if serializer.is_valid():
+            # the frozen totals would no longer match a reopened or moved election
+            if FINALIZED_FIELDS & serializer.validated_data.keys() and ElectionResult.objects.filter(election=election).exists():
+                return Response({'detail': 'election is finalized'}, status=status.HTTP_409_CONFLICT)
             serializer.save()
             return Response(serializer.data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def delete(self, request, pk):
         # Admin only
-        if not request.user.is_authenticated or not _user_has_role(request.user, 'Admin'):
+        if not has_role(request, 'Admin'):
             return Response({'detail': 'admin privileges required'}, status=status.HTTP_403_FORBIDDEN)
         election = get_object_or_404(Election, pk=pk)
         election.delete()
@@ -83,9 +126,11 @@ class CandidatesView(APIView):
     @swagger_auto_schema(request_body=CandidateSerializer)
     def post(self, request, election_id):
         # Admin or Officer
-        if not request.user.is_authenticated or not (_user_has_role(request.user, 'Admin') or _user_has_role(request.user, 'Officer')):
+        if not has_role(request, 'Admin', 'Officer'):
             return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
         election = get_object_or_404(Election, pk=election_id)
+        if ElectionResult.objects.filter(election=election).exists():
+            return Response({'detail': 'election is finalized'}, status=status.HTTP_409_CONFLICT)
         data = request.data.copy()
         data['election'] = election.id
         serializer = CandidateSerializer(data=data)
@@ -95,21 +140,48 @@ class CandidatesView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class SyncView(APIView):
+    """Delta feed of elections and candidates for polling-station devices.
+
+    ``?since=<version>`` returns rows changed after that version plus the ids
+    deleted since; omit it for a full snapshot. Clients store the returned
+    ``version`` and send it on the next call, at once while ``more`` is true.
+    ``reset`` means the client's version predates pruned history: the page
+    starts a full snapshot and local copies should be replaced.
+    """
+    permission_classes = (AllowAny,)
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            return Response({'detail': 'since must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        page = changes(since)
+        return Response({
+            'version': page['version'],
+            'more': page['more'],
+            'reset': page['reset'],
+            'elections': ElectionSerializer(page['elections'], many=True).data,
+            'candidates': CandidateSerializer(page['candidates'], many=True).data,
+            'deleted': page['deleted'],
+        })
+
+
 class CastVoteView(APIView):
     permission_classes = (IsAuthenticated,)
 
     @swagger_auto_schema(request_body=CastVoteSerializer)
     def post(self, request, election_id):
-        election = get_object_or_404(Election, pk=election_id)
-        now = timezone.now()
         # RuBAC time-restricted: only during election window
-        if not (election.start_time <= now <= election.end_time):
+        election = active_elections().get(election_id)
+        if election is None:
+            get_object_or_404(Election, pk=election_id)
             return Response({'detail': 'election is not active'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # check if user already voted in this election
-        existing = Vote.objects.filter(voter=request.user, candidate__election=election).exists()
-        if existing:
-            return Response({'detail': 'user has already voted in this election'}, status=status.HTTP_400_BAD_REQUEST)
+        # ABAC: AccessPolicy rules for resource 'elections', action 'vote'
+        if not is_allowed(request, 'elections', 'vote', district=election.district):
+            return Response({'detail': 'denied by access policy'}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = CastVoteSerializer(data=request.data)
         if not serializer.is_valid():
@@ -119,30 +191,156 @@ class CastVoteView(APIView):
         if candidate.election_id != election.id:
             return Response({'detail': 'candidate does not belong to election'}, status=status.HTTP_400_BAD_REQUEST)
 
-        vote = Vote.objects.create(voter=request.user, candidate=candidate)
+        if settings.VOTE_INGESTION_MODE == 'queued':
+            # write-behind: drain_vote_queue commits the vote later, the receipt tracks it
+            try:
+                with transaction.atomic():
+                    queued = QueuedVote.objects.create(voter=request.user, election=election, candidate=candidate)
+            except IntegrityError:
+                return Response({'detail': 'user has already voted in this election'}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({'detail': 'vote queued', 'receipt': str(queued.receipt)}, status=status.HTTP_202_ACCEPTED)
+
+        # the (voter, election) unique constraint rejects a second vote, even under concurrency
+        try:
+            with transaction.atomic():
+                vote = Vote.objects.create(voter=request.user, election=election, candidate=candidate)
+                record_votes([vote])
+        except IntegrityError:
+            return Response({'detail': 'user has already voted in this election'}, status=status.HTTP_400_BAD_REQUEST)
         return Response({'detail': 'vote recorded', 'vote_id': vote.id}, status=status.HTTP_201_CREATED)
 
 
+class DeviceVoteUploadView(APIView):
+    # polling-station devices sign the raw body with their secret instead of sending a user token
+    authentication_classes = ()
+    permission_classes = (AllowAny,)
+
+    @swagger_auto_schema(request_body=DeviceVoteUploadSerializer)
+    def post(self, request):
+        body = request.body
+        device = PollingStationDevice.objects.filter(name=request.headers.get('X-Device'), is_active=True).first()
+        if device is None or not signature_is_valid(device, body, request.headers.get('X-Signature')):
+            return Response({'detail': 'invalid device signature'}, status=status.HTTP_403_FORBIDDEN)
+
+        serializer = DeviceVoteUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        results = []
+        records = {}
+        for raw in serializer.validated_data['records']:
+            record = DeviceVoteRecordSerializer(data=raw)
+            if not record.is_valid():
+                results.append({'client_id': raw.get('client_id'), 'status': 'invalid', 'errors': record.errors})
+                continue
+            # a client id repeated within the batch gets the outcome of its first record
+            records.setdefault(record.validated_data['client_id'], record.validated_data)
+            results.append(record.validated_data['client_id'])
+
+        outcomes = ingest_device_votes(device, list(records.values()))
+        results = [r if isinstance(r, dict) else {'client_id': r, **outcomes[r]} for r in results]
+        return Response({'results': results})
+
+
+class VoteReceiptView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request, receipt):
+        queued = get_object_or_404(QueuedVote, receipt=receipt, voter=request.user)
+        return Response(QueuedVoteSerializer(queued).data)
+
+
 class ResultsView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def get(self, request, election_id):
         # Admin or Officer
-        if not (_user_has_role(request.user, 'Admin') or _user_has_role(request.user, 'Officer')):
+        if not has_role(request, 'Admin', 'Officer'):
             return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
         election = get_object_or_404(Election, pk=election_id)
-        counts = (
-            Vote.objects.filter(candidate__election=election)
-            .values('candidate')
-            .annotate(votes=Count('id'))
+        if election.end_time < timezone.now():
+            # finalized elections are served from the frozen snapshot; finalize_elections writes it
+            # once ELECTION_FINALIZE_GRACE has passed, never a read
+            result = ElectionResult.objects.filter(election=election).first()
+            if result is not None:
+                rows = result.candidates.filter(votes__gt=0).order_by('-votes').values('candidate_id', 'candidate_name', 'votes')
+                return Response({
+                    'election': election.id,
+                    'district': result.district,
+                    'total_votes': result.total_votes,
+                    'finalized': True,
+                    'results': list(rows),
+                })
+
+        # read the materialized tallies instead of aggregating Vote
+        tallies = (
+            CandidateTally.objects.filter(candidate__election=election, votes__gt=0)
             .order_by('-votes')
+            .values('candidate_id', 'candidate__name', 'votes')
         )
-        # map candidate id to details
-        results = []
-        for row in counts:
-            cand = Candidate.objects.get(pk=row['candidate'])
-            results.append({'candidate_id': cand.id, 'candidate_name': cand.name, 'votes': row['votes']})
+        results = [
+            {'candidate_id': t['candidate_id'], 'candidate_name': t['candidate__name'], 'votes': t['votes']}
+            for t in tallies
+        ]
         return Response({'election': election.id, 'results': results})
+
+
+class TurnoutView(APIView):
+    permission_classes = (IsAuthenticated,)
+
+    @swagger_auto_schema(query_serializer=TurnoutQuerySerializer)
+    def get(self, request):
+        # Admin or Officer
+        if not has_role(request, 'Admin', 'Officer'):
+            return Response({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
+        serializer = TurnoutQuerySerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        params = serializer.validated_data
+        series = turnout_series(
+            election_id=params.get('election'),
+            district=params.get('district'),
+            start=params.get('start'),
+            end=params.get('end'),
+            resolution=params['resolution'],
+        )
+        return Response({'resolution': params['resolution'], 'series': series})
+
+
+class ResultsStreamView(View):
+    """Server-sent events with live per-candidate counts, served by the ASGI app."""
+
+    @staticmethod
+    def _authorize(request, election_id):
+        result = None
+        for authenticator in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+            result = authenticator().authenticate(request)
+            if result is not None:
+                break
+        if result is None:
+            return JsonResponse({'detail': 'authentication credentials were not provided'}, status=status.HTTP_401_UNAUTHORIZED)
+        request.user, request.auth = result
+        # Admin or Officer
+        if not has_role(request, 'Admin', 'Officer'):
+            return JsonResponse({'detail': 'admin/officer privileges required'}, status=status.HTTP_403_FORBIDDEN)
+        if not Election.objects.filter(pk=election_id).exists():
+            return JsonResponse({'detail': 'Not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return None
+
+    async def get(self, request, election_id):
+        try:
+            denied = await sync_to_async(self._authorize)(request, election_id)
+        except AuthenticationFailed as exc:
+            body = exc.detail if isinstance(exc.detail, dict) else {'detail': exc.detail}
+            return JsonResponse(body, status=status.HTTP_401_UNAUTHORIZED)
+        if denied is not None:
+            return denied
+
+        response = StreamingHttpResponse(result_events(election_id), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
 from django.shortcuts import render
 
 # Create your views here.
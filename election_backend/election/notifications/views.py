@@ -7,18 +7,15 @@ from drf_yasg.utils import swagger_auto_schema
 
 from .serializers import SendEmailSerializer, SendSMSSerializer, NotificationLogSerializer
 from .models import NotificationLog
+from access_control.roles import has_role
 
 User = get_user_model()
 
 
-def _user_is_admin_or_officer(user):
+def _user_is_admin_or_officer(request):
     # simple check: staff or has role 'officer' assigned
-    if user.is_superuser or user.is_staff:
-        return True
-    try:
-        return user.roleassignment_set.filter(role__name__iexact='officer').exists()
-    except Exception:
-        return False
+    user = request.user
+    return user.is_superuser or user.is_staff or has_role(request, 'officer')
 
 
 class SendEmailView(APIView):
@@ -26,7 +23,7 @@ class SendEmailView(APIView):
 
     @swagger_auto_schema(request_body=SendEmailSerializer)
     def post(self, request):
-        if not _user_is_admin_or_officer(request.user):
+        if not _user_is_admin_or_officer(request):
             return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = SendEmailSerializer(data=request.data)
@@ -60,7 +57,7 @@ class SendSMSView(APIView):
 
     @swagger_auto_schema(request_body=SendSMSSerializer)
     def post(self, request):
-        if not _user_is_admin_or_officer(request.user):
+        if not _user_is_admin_or_officer(request):
             return Response({'detail': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
 
         serializer = SendSMSSerializer(data=request.data)
@@ -0,0 +1,116 @@
+"""Short-lived verification codes kept in the cache instead of on the User row.
+
+A code is stored only as an HMAC keyed by ``SECRET_KEY``, under a key derived
+from its purpose and subject (the email address or phone number it was sent
+to), and expires by itself after ``VERIFICATION_CODE_TTL`` seconds. Each try
+first takes one of ``VERIFICATION_CODE_MAX_ATTEMPTS`` from a separate counter
+with ``cache.add``/``cache.incr``, so concurrent guesses cannot share a slot;
+this is only atomic across processes on caches with an atomic ``incr``
+(Redis, Memcached), not on the file cache used in development.
+
+MFA enrollment keeps the pending TOTP secret here too, so an abandoned setup
+leaves no ``MFADevice`` row behind. The secret has to be readable to check a
+token, so it is stored as is, for ``MFA_ENROLLMENT_TTL`` seconds.
+"""
+import hashlib
+import secrets
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+KEY = 'users:code:%s:%s'
+ATTEMPTS_KEY = 'users:code:attempts:%s:%s'
+MFA_KEY = 'users:mfa:pending:%s'
+
+EMAIL = 'email'
+PHONE = 'phone'
+# hashed with hash_code but stored in authentication.PasswordReset
+PASSWORD_RESET = 'password_reset'
+
+
+def generate_code():
+    return f"{secrets.randbelow(1000000):06d}"
+
+
+def hash_code(code, purpose):
+    """HMAC of ``code``; only this is ever stored."""
+    return salted_hmac('users.codes.%s' % purpose, code).hexdigest()
+
+
+def normalize_subject(purpose, subject):
+    subject = (subject or '').strip()
+    # password reset codes are also sent to an email address
+    return subject.lower() if purpose in (EMAIL, PASSWORD_RESET) else subject
+
+
+def _digest(purpose, subject):
+    return hashlib.sha1(normalize_subject(purpose, subject).encode()).hexdigest()
+
+
+def _key(purpose, subject):
+    return KEY % (purpose, _digest(purpose, subject))
+
+
+def take_attempt(purpose, subject, timeout):
+    """Count one try at a code for ``subject``; False once the attempts are used up.
+
+    The counter starts with the first try and lasts ``timeout`` seconds.
+    """
+    key = ATTEMPTS_KEY % (purpose, _digest(purpose, subject))
+    if cache.add(key, 1, timeout):
+        return True
+    try:
+        attempts = cache.incr(key)
+    except ValueError:
+        # expired between add and incr
+        attempts = 1 if cache.add(key, 1, timeout) else cache.incr(key)
+    return attempts <= settings.VERIFICATION_CODE_MAX_ATTEMPTS
+
+
+def clear_attempts(purpose, subject):
+    cache.delete(ATTEMPTS_KEY % (purpose, _digest(purpose, subject)))
+
+
+def issue(purpose, subject, user_id):
+    """Store a new code for ``user_id`` sent to ``subject`` and return it; replaces any earlier one.
+
+    Attempts already taken against ``subject`` still count, so asking for a
+    new code does not buy more guesses; a successful `redeem` clears them.
+    """
+    code = generate_code()
+    ttl = settings.VERIFICATION_CODE_TTL
+    cache.set(_key(purpose, subject), (hash_code(code, purpose), user_id, time.time() + ttl), ttl)
+    return code
+
+
+def redeem(purpose, subject, code):
+    """Return the user id ``code`` was issued for and forget the code; None if it is wrong or expired."""
+    key = _key(purpose, subject)
+    entry = cache.get(key)
+    if entry is None:
+        return None
+    digest, user_id, expires_at = entry
+    remaining = expires_at - time.time()
+    # take the attempt before comparing, so the cap holds for concurrent guesses
+    if remaining <= 0 or not take_attempt(purpose, subject, remaining):
+        cache.delete(key)
+        return None
+    if constant_time_compare(digest, hash_code(code, purpose)):
+        cache.delete(key)
+        clear_attempts(purpose, subject)
+        return user_id
+    return None
+
+
+def start_mfa_enrollment(user_id, secret):
+    cache.set(MFA_KEY % user_id, secret, settings.MFA_ENROLLMENT_TTL)
+
+
+def pending_mfa_secret(user_id):
+    return cache.get(MFA_KEY % user_id)
+
+
+def finish_mfa_enrollment(user_id):
+    cache.delete(MFA_KEY % user_id)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:48
+
+from django.db import migrations
+
+# The codes move to the cache (users.codes) and are not carried over: accounts
+# unverified at deploy time get a new code from POST /api/users/resend-code/.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_slimuser'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='user',
+            name='email_verification_code',
+        ),
+        migrations.RemoveField(
+            model_name='user',
+            name='phone_verification_code',
+        ),
+    ]
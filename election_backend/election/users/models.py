@@ -10,9 +10,22 @@ class User(AbstractUser):
     is_email_verified = models.BooleanField(default=False)
     is_phone_verified = models.BooleanField(default=False)
     mfa_enabled = models.BooleanField(default=False)
-    # temporary verification codes (6-digit). Persisted so verification endpoints can validate codes.
-    email_verification_code = models.CharField(max_length=6, null=True, blank=True)
-    phone_verification_code = models.CharField(max_length=6, null=True, blank=True)
+    # email/phone verification codes live in the cache (users.codes), not on this row
+
+class SlimUser(User):
+    """A User loaded with only a few fields (see authentication.backends).
+
+    Touching any other field loads all of the missing ones in one query,
+    instead of Django's default of one query per deferred field.
+    """
+    class Meta:
+        proxy = True
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        deferred = self.get_deferred_fields()
+        if fields is not None and deferred and set(fields) <= deferred:
+            fields = list(deferred)
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
 
 class MFADevice(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
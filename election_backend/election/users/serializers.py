@@ -9,6 +9,12 @@ class RegistrationSerializer(serializers.ModelSerializer):
         model = User
         fields = ('username', 'first_name', 'last_name', 'nid', 'email', 'phone', 'photo', 'password')
 
+    def validate_email(self, value):
+        # verification codes are looked up by address, so two accounts cannot share one
+        if value and User.objects.filter(email__iexact=value).exists():
+            raise serializers.ValidationError('A user with that email already exists.')
+        return value
+
     def create(self, validated_data):
         password = validated_data.pop('password')
         user = User(**validated_data)
@@ -51,3 +57,13 @@ class VerifyEmailSerializer(serializers.Serializer):
 class VerifyPhoneSerializer(serializers.Serializer):
     phone = serializers.CharField()
     code = serializers.CharField()
+
+
+class ResendCodeSerializer(serializers.Serializer):
+    email = serializers.EmailField(required=False)
+    phone = serializers.CharField(required=False)
+
+    def validate(self, attrs):
+        if bool(attrs.get('email')) == bool(attrs.get('phone')):
+            raise serializers.ValidationError('exactly one of email or phone is required')
+        return attrs
@@ -1,3 +1,93 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from authentication.cache import get_user_version
+
+from . import codes
+from .models import SlimUser, User
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM, AUTH_RATE_LIMITS={}, VERIFICATION_CODE_MAX_ATTEMPTS=3)
+class VerificationCodeTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('u', 'u@example.com', nid='1', phone='555')
+        self.client = APIClient()
+
+    def wrong(self, code):
+        return '000000' if code != '000000' else '111111'
+
+    def test_right_code_fails_once_attempts_are_used_up(self):
+        code = codes.issue(codes.EMAIL, 'u@example.com', self.user.pk)
+        for _ in range(3):
+            self.assertIsNone(codes.redeem(codes.EMAIL, 'u@example.com', self.wrong(code)))
+        self.assertIsNone(codes.redeem(codes.EMAIL, 'u@example.com', code))
+
+    def test_attempts_are_counted_apart_from_the_code(self):
+        # concurrent guesses each take their own slot, none can overwrite another's count
+        codes.issue(codes.PHONE, '555', self.user.pk)
+        results = [codes.take_attempt(codes.PHONE, '555', 60) for _ in range(4)]
+        self.assertEqual(results, [True, True, True, False])
+
+    def test_code_redeemed_once(self):
+        code = codes.issue(codes.EMAIL, 'U@example.com', self.user.pk)
+        self.assertEqual(codes.redeem(codes.EMAIL, 'u@example.com', code), self.user.pk)
+        self.assertIsNone(codes.redeem(codes.EMAIL, 'u@example.com', code))
+
+    def test_changed_email_is_not_verified_by_old_code(self):
+        code = codes.issue(codes.EMAIL, 'u@example.com', self.user.pk)
+        User.objects.filter(pk=self.user.pk).update(email='new@example.com')
+        response = self.client.post('/api/users/verify-email/', {'email': 'u@example.com', 'code': code})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_email_verified)
+
+    def test_resend_code_replaces_expired_one(self):
+        response = self.client.post('/api/users/resend-code/', {'email': 'U@example.com'})
+        code = response.data['verification_code']
+        response = self.client.post('/api/users/verify-email/', {'email': 'u@example.com', 'code': code})
+        self.assertEqual(response.status_code, 200)
+        # verified accounts get no new code
+        response = self.client.post('/api/users/resend-code/', {'email': 'u@example.com'})
+        self.assertNotIn('verification_code', response.data)
+
+    def test_resend_does_not_reset_attempts(self):
+        code = codes.issue(codes.PHONE, '555', self.user.pk)
+        for _ in range(3):
+            codes.redeem(codes.PHONE, '555', self.wrong(code))
+        code = self.client.post('/api/users/resend-code/', {'phone': '555'}).data['verification_code']
+        self.assertIsNone(codes.redeem(codes.PHONE, '555', code))
+
+    def test_duplicate_email_rejected_at_registration(self):
+        response = self.client.post('/api/users/register/', {
+            'username': 'other', 'nid': '2', 'phone': '556', 'email': 'U@EXAMPLE.com', 'password': 'pw',
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('email', response.data)
+
+    def test_verify_phone(self):
+        code = codes.issue(codes.PHONE, '555', self.user.pk)
+        version = get_user_version(self.user.pk)
+        response = self.client.post('/api/users/verify-phone/', {'phone': '555', 'code': code})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.get(pk=self.user.pk).is_phone_verified)
+        # the slim user cached by the authentication backend must be reloaded
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+    def test_verify_email_invalidates_cached_user(self):
+        code = codes.issue(codes.EMAIL, 'u@example.com', self.user.pk)
+        version = get_user_version(self.user.pk)
+        response = self.client.post('/api/users/verify-email/', {'email': 'u@example.com', 'code': code})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(get_user_version(self.user.pk), version)
+
+    def test_slim_user_save_invalidates_cached_user(self):
+        version = get_user_version(self.user.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            SlimUser.objects.get(pk=self.user.pk).save()
+            self.assertEqual(get_user_version(self.user.pk), version)
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(get_user_version(self.user.pk), version)
@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('register/', views.RegisterView.as_view(), name='user-register'),
     path('verify-email/', views.VerifyEmailView.as_view(), name='user-verify-email'),
+    path('resend-code/', views.ResendCodeView.as_view(), name='user-resend-code'),
     path('verify-phone/', views.VerifyPhoneView.as_view(), name='user-verify-phone'),
     path('profile/', views.ProfileView.as_view(), name='user-profile'),
     path('change-password/', views.ChangePasswordView.as_view(), name='user-change-password'),
@@ -2,7 +2,6 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from django.shortcuts import get_object_or_404
 from .models import User, MFADevice
 from .serializers import (
 	RegistrationSerializer,
@@ -11,16 +10,15 @@ from .serializers import (
 	MFAVerifySerializer,
 	VerifyEmailSerializer,
 	VerifyPhoneSerializer,
+	ResendCodeSerializer,
 )
 from drf_yasg.utils import swagger_auto_schema
-import random
+from authentication.cache import bump_user_version
+from authentication.throttling import TokenBucketThrottle
+from . import codes
 import pyotp
 
 
-def _gen_code():
-	return f"{random.randint(0, 999999):06d}"
-
-
 class RegisterView(APIView):
 	permission_classes = (AllowAny,)
 
@@ -30,14 +28,12 @@ class RegisterView(APIView):
 		if not serializer.is_valid():
 			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+		# a single INSERT; the verification codes go to the cache (users.codes)
 		user = serializer.save()
 
 		# generate verification codes (in real app send via email/SMS)
-		email_code = _gen_code()
-		phone_code = _gen_code()
-		user.email_verification_code = email_code
-		user.phone_verification_code = phone_code
-		user.save()
+		email_code = codes.issue(codes.EMAIL, user.email, user.id)
+		phone_code = codes.issue(codes.PHONE, user.phone, user.id)
 
 		# For development we'll return the codes in the response so they can be used to verify.
 		return Response({
@@ -48,8 +44,44 @@ class RegisterView(APIView):
 		}, status=status.HTTP_201_CREATED)
 
 
+class ResendCodeView(APIView):
+	"""Issue a fresh email or phone verification code for an unverified account.
+
+	Codes expire after VERIFICATION_CODE_TTL and were not carried over when they
+	moved off the User row, so this is how an unverified account gets a new one.
+	The new code replaces the old one but not its used-up attempts.
+	"""
+	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'resend_code'
+
+	@swagger_auto_schema(request_body=ResendCodeSerializer)
+	def post(self, request):
+		serializer = ResendCodeSerializer(data=request.data)
+		if not serializer.is_valid():
+			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+		email = serializer.validated_data.get('email')
+		phone = serializer.validated_data.get('phone')
+		if email:
+			purpose, subject = codes.EMAIL, email
+			user_id = User.objects.filter(email__iexact=email, is_email_verified=False).values_list('pk', flat=True).first()
+		else:
+			purpose, subject = codes.PHONE, phone
+			user_id = User.objects.filter(phone=phone, is_phone_verified=False).values_list('pk', flat=True).first()
+
+		if user_id is None:
+			# don't reveal whether the address is registered
+			return Response({'detail': 'If the address is registered and unverified a code has been sent.'})
+
+		# Development convenience: return the code in response. In prod send via email/SMS.
+		return Response({'detail': 'verification code generated', 'verification_code': codes.issue(purpose, subject, user_id)})
+
+
 class VerifyEmailView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'verify_email'
 
 	@swagger_auto_schema(request_body=VerifyEmailSerializer)
 	def post(self, request):
@@ -60,17 +92,20 @@ class VerifyEmailView(APIView):
 		email = serializer.validated_data['email']
 		code = serializer.validated_data['code']
 
-		user = get_object_or_404(User, email=email)
-		if user.email_verification_code == code:
-			user.is_email_verified = True
-			user.email_verification_code = None
-			user.save()
+		# checked in the cache first; the user row is only touched by a correct code, and only
+		# while it still has the address the code was sent to
+		user_id = codes.redeem(codes.EMAIL, email, code)
+		if user_id is not None and User.objects.filter(pk=user_id, email__iexact=email).update(is_email_verified=True):
+			# update() sends no post_save, so drop the cached slim user here
+			bump_user_version(user_id)
 			return Response({'detail': 'email verified'})
 		return Response({'detail': 'invalid code'}, status=status.HTTP_400_BAD_REQUEST)
 
 
 class VerifyPhoneView(APIView):
 	permission_classes = (AllowAny,)
+	throttle_classes = (TokenBucketThrottle,)
+	throttle_scope = 'verify_phone'
 
 	@swagger_auto_schema(request_body=VerifyPhoneSerializer)
 	def post(self, request):
@@ -81,11 +116,11 @@ class VerifyPhoneView(APIView):
 		phone = serializer.validated_data['phone']
 		code = serializer.validated_data['code']
 
-		user = get_object_or_404(User, phone=phone)
-		if user.phone_verification_code == code:
-			user.is_phone_verified = True
-			user.phone_verification_code = None
-			user.save()
+		# checked in the cache first; the user row is only touched by a correct code, and only
+		# while it still has the address the code was sent to
+		user_id = codes.redeem(codes.PHONE, phone, code)
+		if user_id is not None and User.objects.filter(pk=user_id, phone=phone).update(is_phone_verified=True):
+			bump_user_version(user_id)
 			return Response({'detail': 'phone verified'})
 		return Response({'detail': 'invalid code'}, status=status.HTTP_400_BAD_REQUEST)
 
@@ -125,12 +160,12 @@ class SetupMFAView(APIView):
 
 	@swagger_auto_schema(request_body=None)
 	def post(self, request):
-		# generate secret and create an MFADevice (unverified until user verifies)
+		# generate a secret; the MFADevice is only created once the user verifies a token
 		secret = pyotp.random_base32()
-		device = MFADevice.objects.create(user=request.user, secret=secret)
+		codes.start_mfa_enrollment(request.user.id, secret)
 		totp = pyotp.TOTP(secret)
 		provisioning_uri = totp.provisioning_uri(name=request.user.email or request.user.username, issuer_name='ElectionApp')
-		return Response({'secret': secret, 'provisioning_uri': provisioning_uri, 'device_id': device.id})
+		return Response({'secret': secret, 'provisioning_uri': provisioning_uri})
 
 
 class VerifyMFAView(APIView):
@@ -143,15 +178,23 @@ class VerifyMFAView(APIView):
 			return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 		token = serializer.validated_data['token']
-		# verify against the latest device for the user
-		device = MFADevice.objects.filter(user=request.user).order_by('-created_at').first()
-		if not device:
-			return Response({'detail': 'no mfa device found'}, status=status.HTTP_400_BAD_REQUEST)
+		# a pending enrollment first, else the latest enrolled device
+		secret = codes.pending_mfa_secret(request.user.id)
+		if secret is None:
+			device = MFADevice.objects.filter(user=request.user).order_by('-created_at').first()
+			if not device:
+				return Response({'detail': 'no mfa device found'}, status=status.HTTP_400_BAD_REQUEST)
+			secret = device.secret
+		else:
+			device = None
 
-		totp = pyotp.TOTP(device.secret)
+		totp = pyotp.TOTP(secret)
 		if totp.verify(token):
-			request.user.mfa_enabled = True
-			request.user.save()
+			if device is None:
+				MFADevice.objects.create(user=request.user, secret=secret)
+				codes.finish_mfa_enrollment(request.user.id)
+			User.objects.filter(pk=request.user.pk).update(mfa_enabled=True)
+			bump_user_version(request.user.pk)
 			return Response({'detail': 'mfa verified'})
 		return Response({'detail': 'invalid token'}, status=status.HTTP_400_BAD_REQUEST)
 